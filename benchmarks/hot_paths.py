@@ -0,0 +1,217 @@
+"""Benchmark de las rutas calientes del bot contra un upstream local.
+
+Arranca benchmarks/stub_server.py (Jupiter, Raydium y Solana RPC simulados
+con latencia configurable) y ejecuta los handlers reales de PhantomBot con
+updates falsos para 1, 100 y 1000 usuarios concurrentes:
+
+    trending        /trending con la instantánea fría (stream de /pairs de varios MB)
+    analyze         /analyze sobre un conjunto de mints compartido
+    portfolio       token_balances de la Web App con una wallet grande
+    portfolio_rpc   /portfolio leyendo los balances por JSON-RPC
+
+Cada escenario usa un bot nuevo (cachés vacías) e informa throughput,
+latencias p50/p99, memoria máxima y llamadas a upstream por ruta, en JSON.
+
+Uso:
+    python benchmarks/hot_paths.py [--users 1,100,1000] [--latency-ms 50]
+                                   [--scenarios trending,analyze] [--output result.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("TELEGRAM_TOKEN", "0:benchmark")
+
+import phantom_bot  # noqa: E402
+from stub_server import mint_for  # noqa: E402
+
+SCENARIOS = ["trending", "analyze", "portfolio", "portfolio_rpc"]
+
+
+class FakeMessage:
+    def __init__(self):
+        self.replies = 0
+
+    async def reply_text(self, text, **kwargs):
+        self.replies += 1
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+
+
+class FakeUpdate:
+    def __init__(self, user_id: int):
+        self.message = FakeMessage()
+        self.effective_user = FakeUser(user_id)
+        self.effective_chat = FakeUser(user_id)
+
+
+class FakeContext:
+    def __init__(self, args=None):
+        self.args = args or []
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(port: int, args) -> subprocess.Popen:
+    """Lanzar el servidor simulado y esperar a que acepte conexiones"""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "benchmarks", "stub_server.py"),
+         "--port", str(port), "--latency-ms", str(args.latency_ms),
+         "--pairs", str(args.pairs), "--wallet-tokens", str(args.wallet_tokens)],
+        stdout=subprocess.DEVNULL
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/__stats", timeout=1)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("El servidor simulado no arrancó")
+
+
+def configure(base: str):
+    """Apuntar el bot al servidor simulado, sin límites de tasa (tampoco de envío) ni disco"""
+    phantom_bot.Config.JUPITER_API_BASE = f"{base}/jup"
+    phantom_bot.Config.RAYDIUM_API_BASE = f"{base}/ray"
+    phantom_bot.Config.SOLANA_RPC_URL = f"{base}/rpc"
+    phantom_bot.Config.SESSION_BACKEND = "memory"
+    phantom_bot.Config.HISTORY_STORE_DIR = tempfile.mkdtemp(prefix="phantom-history-")
+    phantom_bot.Config.PROVIDER_RATE_LIMITS = ""
+    phantom_bot.Config.PROVIDER_DEFAULT_RATE_LIMIT = "100000/100000"
+    phantom_bot.Config.SEND_RATE_LIMIT = "100000/100000"
+    phantom_bot.Config.PROFILE_SAMPLE_RATE = 0.0
+
+
+def percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def make_request(bot, scenario: str, user: int, args):
+    """Coroutine que simula el update de un usuario en el escenario dado"""
+    update = FakeUpdate(user)
+    if scenario == "trending":
+        return bot.trending(update, FakeContext())
+    if scenario == "analyze":
+        mint = mint_for(user % args.analyze_mints)
+        return bot.analyze(update, FakeContext([mint]))
+
+    wallet = mint_for(-100000 - user)
+    await bot.sessions.set(user, wallet)
+    if scenario == "portfolio":
+        tokens = [
+            {"mint": mint_for((user + i) % args.pairs), "amount": float(i + 1)}
+            for i in range(args.wallet_tokens)
+        ]
+        return bot.process_webapp_action(user, {"action": "token_balances", "tokens": tokens}, update.message.reply_text)
+    return bot.portfolio(update, FakeContext())
+
+
+async def run_scenario(base: str, scenario: str, users: int, args) -> dict:
+    httpx.post(f"{base}/__reset")
+    bot = phantom_bot.PhantomBot()
+    requests = [await make_request(bot, scenario, user, args) for user in range(users)]
+    latencies = []
+
+    async def timed(coro):
+        started = time.perf_counter()
+        await coro
+        latencies.append(time.perf_counter() - started)
+
+    if args.trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(timed(coro) for coro in requests))
+    elapsed = time.perf_counter() - started
+    peak = 0
+    if args.trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    await bot.token_analyzer.close()
+    upstream = httpx.get(f"{base}/__stats").json()
+    return {
+        "scenario": scenario,
+        "users": users,
+        "elapsed_s": elapsed,
+        "throughput_rps": users / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_traced_mb": peak / 1e6 if args.trace_memory else None,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "upstream_calls": sum(upstream.values()),
+        "upstream_calls_by_route": upstream
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", default="1,100,1000", help="Niveles de concurrencia separados por comas")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--latency-ms", type=float, default=50, help="Latencia simulada de cada petición upstream")
+    parser.add_argument("--pairs", type=int, default=20000, help="Pares en la respuesta de /pairs")
+    parser.add_argument("--wallet-tokens", type=int, default=60, help="Tokens por wallet en los escenarios de portfolio")
+    parser.add_argument("--analyze-mints", type=int, default=200, help="Mints distintos que consultan los usuarios de /analyze")
+    parser.add_argument("--no-tracemalloc", dest="trace_memory", action="store_false",
+                        help="No medir la memoria con tracemalloc (mide latencias sin su sobrecoste)")
+    parser.add_argument("--output", help="Guardar el resultado JSON en este fichero")
+    args = parser.parse_args()
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    configure(base)
+    stub = start_stub(port, args)
+    try:
+        results = []
+        for scenario in args.scenarios.split(","):
+            for users in map(int, args.users.split(",")):
+                result = asyncio.run(run_scenario(base, scenario, users, args))
+                print(
+                    f"{scenario:>14} x{users:<5} {result['throughput_rps']:8.1f} req/s  "
+                    f"p50 {result['p50_ms']:8.1f} ms  p99 {result['p99_ms']:8.1f} ms  "
+                    f"upstream {result['upstream_calls']}",
+                    file=sys.stderr
+                )
+                results.append(result)
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    report = {
+        "benchmark": "hot_paths",
+        "latency_ms": args.latency_ms,
+        "pairs": args.pairs,
+        "wallet_tokens": args.wallet_tokens,
+        "results": results
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark de arranque del bot.
+
+Mide en procesos nuevos cuánto tarda `import phantom_bot` y la creación de
+`PhantomBot`, la memoria máxima usada y qué dependencias pesadas quedaron
+cargadas. Imprime el resultado en JSON para poder comparar ejecuciones.
+
+Uso:
+    python benchmarks/startup.py [--runs 5] [--max-import-ms 1500]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = [
+    "numpy", "pandas", "selenium", "qrcode", "PIL"
+]
+
+PROBE = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+import phantom_bot
+t1 = time.perf_counter()
+bot = phantom_bot.PhantomBot()
+t2 = time.perf_counter()
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{
+    "import_ms": (t1 - t0) * 1000,
+    "init_ms": (t2 - t1) * 1000,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": len(sys.modules),
+    "heavy_modules_loaded": heavy
+}}))
+"""
+
+
+def run_probe() -> dict:
+    """Ejecutar una medición en un intérprete limpio"""
+    env = dict(os.environ, TELEGRAM_TOKEN=os.environ.get("TELEGRAM_TOKEN", "0:benchmark"))
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=None,
+                        help="Salir con código 1 si la mediana de import supera este valor")
+    args = parser.parse_args()
+
+    samples = [run_probe() for _ in range(args.runs)]
+    result = {
+        "benchmark": "startup",
+        "runs": args.runs,
+        "import_ms_p50": statistics.median(s["import_ms"] for s in samples),
+        "init_ms_p50": statistics.median(s["init_ms"] for s in samples),
+        "max_rss_mb": max(s["max_rss_mb"] for s in samples),
+        "modules": samples[-1]["modules"],
+        "heavy_modules_loaded": samples[-1]["heavy_modules_loaded"]
+    }
+    print(json.dumps(result, indent=2))
+
+    if args.max_import_ms is not None and result["import_ms_p50"] > args.max_import_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
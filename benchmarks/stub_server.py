@@ -0,0 +1,201 @@
+"""Servidor local que imita las APIs de Jupiter, Raydium y Solana RPC.
+
+Responde a partir de las respuestas de ejemplo de benchmarks/fixtures,
+variando precios y volúmenes de forma determinista por mint, con una
+latencia configurable. Cuenta las peticiones por ruta para que el
+benchmark pueda medir las llamadas a upstream.
+
+Rutas:
+    GET  /jup/price?ids=...               (Jupiter /price)
+    GET  /ray/token/{mint}                (Raydium /token)
+    GET  /ray/price-history?address=...   (Raydium /price-history)
+    GET  /ray/pairs                       (Raydium /pairs, varios MB)
+    POST /rpc                             (Solana JSON-RPC, admite lotes)
+    GET  /__stats   POST /__reset         (contadores de peticiones)
+
+Uso:
+    python benchmarks/stub_server.py [--port 8765] [--latency-ms 50] [--pairs 20000]
+"""
+import argparse
+import asyncio
+import base64
+import copy
+import hashlib
+import json
+import os
+
+import base58
+from aiohttp import web
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+TOKEN_PROGRAM_ID = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+TOKEN_2022_PROGRAM_ID = "TokenzQdBNbLqP5VEhdkAS6EPFLC1PHnBqCXEpPxuEb"
+WRAPPED_SOL_MINT = "So11111111111111111111111111111111111111112"
+
+
+def load_fixture(name: str):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def mint_for(index: int) -> str:
+    """Mint determinista (dirección base58 de 32 bytes) para el índice dado"""
+    return base58.b58encode(hashlib.sha256(f"mint-{index}".encode()).digest()).decode()
+
+
+def factor(mint: str) -> float:
+    """Número determinista en [0, 1) derivado del mint"""
+    return int.from_bytes(hashlib.sha256(mint.encode()).digest()[:4], "little") / 2 ** 32
+
+
+class StubUpstream:
+    def __init__(self, latency_ms: float, pairs: int, wallet_tokens: int,
+                 token2022_tokens: int = 0, lamports: int = 1_500_000_000, wsol_lamports: int = 0):
+        self.latency = latency_ms / 1000
+        self.wallet_tokens = wallet_tokens
+        self.token2022_tokens = token2022_tokens
+        self.lamports = lamports
+        self.wsol_lamports = wsol_lamports
+        self.rpc_error = None  # Si se fija, todas las llamadas RPC responden con este error
+        self.counts = {}
+        self.price_fixture = load_fixture("jupiter_price.json")
+        self.token_fixture = load_fixture("raydium_token.json")
+        self.history_fixture = load_fixture("raydium_price_history.json")
+        self.pairs_body = self._build_pairs(load_fixture("raydium_pair.json"), pairs)
+
+    @staticmethod
+    def _build_pairs(template: dict, count: int) -> bytes:
+        """Generar un /pairs realista a partir de un par de ejemplo"""
+        pairs = []
+        for i in range(count):
+            pair = copy.deepcopy(template)
+            mint = mint_for(i)
+            pair["name"] = f"TK{i}-USDC"
+            pair["ammId"] = mint_for(-i - 1)
+            pair["volume24h"] = round(template["volume24h"] * factor(mint) ** 3, 2)
+            pair["liquidity"] = round(template["liquidity"] * factor(mint[::-1]), 2)
+            pair["tokenInfo"] = {"mint": mint, "symbol": f"TK{i}", "decimals": 6 + i % 4}
+            pairs.append(pair)
+        return json.dumps(pairs).encode()
+
+    @web.middleware
+    async def middleware(self, request, handler):
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else "?"
+        if not route.startswith("/__"):
+            self.counts[route] = self.counts.get(route, 0) + 1
+            await asyncio.sleep(self.latency)
+        return await handler(request)
+
+    async def price(self, request):
+        template = next(iter(self.price_fixture["data"].values()))
+        data = {}
+        for mint in filter(None, request.query.get("ids", "").split(",")):
+            entry = dict(template, id=mint)
+            entry["price"] = round(template["price"] * (0.001 + factor(mint)), 8)
+            data[mint] = entry
+        return web.json_response({"data": data, "timeTaken": self.price_fixture["timeTaken"]})
+
+    async def token(self, request):
+        mint = request.match_info["mint"]
+        f = factor(mint)
+        token = dict(self.token_fixture, mint=mint, name=f"Token {mint[:4]}", symbol=mint[:4].upper())
+        token["volume24h"] = round(self.token_fixture["volume24h"] * f ** 3, 2)
+        token["marketCap"] = round(self.token_fixture["marketCap"] * f ** 4, 2)
+        token["holderCount"] = int(self.token_fixture["holderCount"] * f ** 4)
+        token["createdAt"] = self.token_fixture["createdAt"] + int(f * 3 * 365 * 86400)
+        return web.json_response(token)
+
+    async def price_history(self, request):
+        scale = 0.001 + factor(request.query.get("address", ""))
+        return web.json_response([
+            {"time": point["time"], "price": point["price"] * scale, "volume": point["volume"] * scale}
+            for point in self.history_fixture
+        ])
+
+    async def pairs(self, request):
+        return web.Response(body=self.pairs_body, content_type="application/json")
+
+    @staticmethod
+    def token_account(index: int, mint: str, raw_amount: int) -> dict:
+        """Cuenta SPL codificada como la devuelve getTokenAccountsByOwner (base64)"""
+        data = base58.b58decode(mint) + bytes(32) + raw_amount.to_bytes(8, "little") + bytes(93)
+        return {
+            "pubkey": mint_for(-index - 1000),
+            "account": {"data": [base64.b64encode(data).decode(), "base64"], "lamports": 2039280}
+        }
+
+    def _rpc_result(self, method: str, params: list):
+        if method == "getBalance":
+            return {"context": {"slot": 1}, "value": self.lamports}
+        if method == "getTokenAccountsByOwner":
+            # Token clásico: mints 0..N-1 (6 decimales) y wSOL; Token-2022: los siguientes
+            if params[1]["programId"] == TOKEN_PROGRAM_ID:
+                accounts = [self.token_account(i, mint_for(i), 10 ** 6 * (i + 1))
+                            for i in range(self.wallet_tokens)]
+                if self.wsol_lamports:
+                    accounts.append(self.token_account(-1, WRAPPED_SOL_MINT, self.wsol_lamports))
+            elif params[1]["programId"] == TOKEN_2022_PROGRAM_ID:
+                accounts = [self.token_account(i, mint_for(i), 10 ** 6 * (i + 1))
+                            for i in range(self.wallet_tokens, self.wallet_tokens + self.token2022_tokens)]
+            else:
+                accounts = []
+            return {"context": {"slot": 1}, "value": accounts}
+        if method == "getMultipleAccounts":
+            def decimals(mint):
+                value = 9 if mint == WRAPPED_SOL_MINT else 6
+                return {"data": [base64.b64encode(bytes([value])).decode(), "base64"]}
+            return {"context": {"slot": 1}, "value": [decimals(mint) for mint in params[0]]}
+        raise ValueError(method)
+
+    async def rpc(self, request):
+        body = await request.json()
+        calls = body if isinstance(body, list) else [body]
+        responses = []
+        for call in calls:
+            if self.rpc_error:
+                responses.append({"jsonrpc": "2.0", "id": call["id"],
+                                  "error": {"code": -32005, "message": self.rpc_error}})
+                continue
+            try:
+                result = self._rpc_result(call["method"], call.get("params", []))
+                responses.append({"jsonrpc": "2.0", "id": call["id"], "result": result})
+            except ValueError as e:
+                responses.append({"jsonrpc": "2.0", "id": call["id"],
+                                  "error": {"code": -32601, "message": f"Method not found: {e}"}})
+        return web.json_response(responses if isinstance(body, list) else responses[0])
+
+    async def stats(self, request):
+        return web.json_response(self.counts)
+
+    async def reset(self, request):
+        self.counts = {}
+        return web.json_response({"ok": True})
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.middleware])
+        app.router.add_get("/jup/price", self.price)
+        app.router.add_get("/ray/token/{mint}", self.token)
+        app.router.add_get("/ray/price-history", self.price_history)
+        app.router.add_get("/ray/pairs", self.pairs)
+        app.router.add_post("/rpc", self.rpc)
+        app.router.add_get("/__stats", self.stats)
+        app.router.add_post("/__reset", self.reset)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--pairs", type=int, default=20000)
+    parser.add_argument("--wallet-tokens", type=int, default=60)
+    args = parser.parse_args()
+
+    stub = StubUpstream(args.latency_ms, args.pairs, args.wallet_tokens)
+    print(f"/pairs: {len(stub.pairs_body) / 1e6:.1f} MB", flush=True)
+    web.run_app(stub.app(), host=args.host, port=args.port, print=lambda *a: print(*a, flush=True))
+
+
+if __name__ == "__main__":
+    main()
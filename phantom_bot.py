@@ -1,26 +1,38 @@
 import os
+import abc
 import json
-import qrcode
-from io import BytesIO
+import base64
+import hashlib
+import hmac
+import functools
+import base58
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, InputFile, WebAppInfo
 from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, filters
-from cryptography.fernet import Fernet
-import requests
+from telegram.error import BadRequest, RetryAfter
+from telegram.helpers import escape_markdown
+import asyncio
+import bisect
+import contextvars
+import heapq
+import itertools
+import random
+import httpx
+from urllib.parse import urlsplit, parse_qsl
 from dotenv import load_dotenv
 import time
-from datetime import datetime, timedelta
-import numpy as np
-import pandas as pd
+import cProfile
+import signal
+import sqlite3
+import sys
+import threading
+import warnings
+from array import array
 from typing import Dict, List
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import base58
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+
+# Las dependencias pesadas (numpy, pandas, selenium, qrcode...) se importan
+# dentro de las funciones que las usan para no penalizar el arranque del bot.
 
 # Load environment variables
 load_dotenv()
@@ -33,6 +45,95 @@ class Config:
     RAYDIUM_API_BASE = "https://api.raydium.io/v2"
     WEBAPP_URL = os.getenv("WEBAPP_URL", "https://your-webapp-url.com")
 
+    # Modo de recepción de updates: "polling" o "webhook"
+    BOT_MODE = os.getenv("BOT_MODE", "polling")
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # URL pública base, p.ej. https://bot.ejemplo.com
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+
+    # Servidor web local (webhook, Web App y métricas); en modo polling es opcional
+    WEB_SERVER_ENABLED = os.getenv("WEB_SERVER_ENABLED", "false").lower() == "true"
+    WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+    WEB_PORT = int(os.getenv("WEB_PORT", "8080"))
+    WEBAPP_AUTH_MAX_AGE = float(os.getenv("WEBAPP_AUTH_MAX_AGE", "86400"))
+
+    # Métricas y perfilado
+    ADMIN_IDS = {int(i) for i in os.getenv("ADMIN_IDS", "").split(",") if i.strip()}
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # Bearer para /metrics; sin él no se sirven
+    LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # 0 = desactivado
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+    # Cliente HTTP compartido
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+    HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+    HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "10"))
+    HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+    HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+    SOURCE_TIMEOUT = float(os.getenv("SOURCE_TIMEOUT", "5"))
+
+    # Límite de peticiones por proveedor: "host=peticiones_por_segundo/ráfaga,..."
+    PROVIDER_RATE_LIMITS = os.getenv(
+        "PROVIDER_RATE_LIMITS",
+        "price.jup.ag=10/20,api.raydium.io=5/10,api.mainnet-beta.solana.com=4/8"
+    )
+    PROVIDER_DEFAULT_RATE_LIMIT = os.getenv("PROVIDER_DEFAULT_RATE_LIMIT", "10/20")
+
+    # Tokens en tendencia
+    TRENDING_TOP_N = int(os.getenv("TRENDING_TOP_N", "10"))
+    TRENDING_CONCURRENCY = int(os.getenv("TRENDING_CONCURRENCY", "10"))
+    TRENDING_REFRESH_INTERVAL = float(os.getenv("TRENDING_REFRESH_INTERVAL", "60"))
+    TRENDING_MAX_AGE = float(os.getenv("TRENDING_MAX_AGE", "600"))
+
+    # Sesiones de wallets: "memory" (un solo proceso) o "sqlite" (persistente y compartido)
+    SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")
+    SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+    SESSION_TTL = float(os.getenv("SESSION_TTL", str(7 * 24 * 3600)))
+
+    # Alertas de precio
+    ALERT_POLL_INTERVAL = float(os.getenv("ALERT_POLL_INTERVAL", "30"))
+    ALERT_MAX_PER_CHAT = int(os.getenv("ALERT_MAX_PER_CHAT", "20"))
+    ALERT_CHAT_INTERVAL = float(os.getenv("ALERT_CHAT_INTERVAL", "3"))
+    ALERT_SEND_CONCURRENCY = int(os.getenv("ALERT_SEND_CONCURRENCY", "20"))
+
+    # Mensajes de Telegram: tamaño máximo, ritmo global de envío y caché de renderizado
+    MESSAGE_MAX_LENGTH = int(os.getenv("MESSAGE_MAX_LENGTH", "4096"))
+    SEND_RATE_LIMIT = os.getenv("SEND_RATE_LIMIT", "30/30")  # mensajes por segundo/ráfaga
+    SEND_RETRIES = int(os.getenv("SEND_RETRIES", "3"))
+    RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "1000"))
+
+    # Ejecutores para trabajo pesado: procesos (CPU) e hilos (E/S bloqueante)
+    PROCESS_POOL_SIZE = int(os.getenv("PROCESS_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+    THREAD_POOL_SIZE = int(os.getenv("THREAD_POOL_SIZE", "16"))
+    EXECUTOR_QUEUE_SIZE = int(os.getenv("EXECUTOR_QUEUE_SIZE", "32"))  # trabajos en espera por pool
+    UPDATE_EXPIRY = float(os.getenv("UPDATE_EXPIRY", "60"))  # segundos tras los que no se responde a un update
+
+    # Histórico local de precios (un fichero por mint, leído con np.memmap)
+    HISTORY_STORE_DIR = os.getenv("HISTORY_STORE_DIR", "history")
+    HISTORY_COLLECT_INTERVAL = float(os.getenv("HISTORY_COLLECT_INTERVAL", "300"))
+    HISTORY_MAX_LAG = float(os.getenv("HISTORY_MAX_LAG", "900"))  # antigüedad máxima del último punto local
+    HISTORY_WINDOW = float(os.getenv("HISTORY_WINDOW", "86400"))  # ventana de cambio 24h e indicadores
+    HISTORY_MAX_TRACKED = int(os.getenv("HISTORY_MAX_TRACKED", "500"))
+
+    # Navegadores headless (solo se lanzan cuando hace falta hacer scraping)
+    BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+    BROWSER_IDLE_TIMEOUT = float(os.getenv("BROWSER_IDLE_TIMEOUT", "300"))
+
+    # Precios en lote de Jupiter
+    JUPITER_BATCH_SIZE = int(os.getenv("JUPITER_BATCH_SIZE", "100"))
+    JUPITER_MAX_URL_LENGTH = int(os.getenv("JUPITER_MAX_URL_LENGTH", "2000"))
+
+    # Caché de tokens (segundos); los datos caducados se sirven durante TTL * STALE_FACTOR
+    CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", "5000"))
+    CACHE_STALE_FACTOR = float(os.getenv("CACHE_STALE_FACTOR", "4"))
+    METADATA_TTL = float(os.getenv("METADATA_TTL", "21600"))
+    MARKET_TTL = float(os.getenv("MARKET_TTL", "120"))
+    PRICE_TTL = float(os.getenv("PRICE_TTL", "15"))
+    HISTORY_TTL = float(os.getenv("HISTORY_TTL", "60"))
+    WALLET_TTL = float(os.getenv("WALLET_TTL", "30"))
+    PORTFOLIO_TTL = float(os.getenv("PORTFOLIO_TTL", "3600"))
+
 # Keyboard Markup
 def get_main_keyboard():
     """Get the main keyboard markup with Web App button"""
@@ -50,199 +151,2325 @@ def get_main_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
-def get_trading_keyboard():
-    """Get trading keyboard markup"""
-    keyboard = [
-        [
-            KeyboardButton("🔄 Swap Tokens"),
-            KeyboardButton("📊 Precios")
-        ],
-        [
-            KeyboardButton("⬅️ Volver al Menú")
+def get_trading_keyboard():
+    """Get trading keyboard markup"""
+    keyboard = [
+        [
+            KeyboardButton("🔄 Swap Tokens"),
+            KeyboardButton("📊 Precios")
+        ],
+        [
+            KeyboardButton("⬅️ Volver al Menú")
+        ]
+    ]
+    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+
+# Solo se manejan mensajes (los datos de la Web App llegan dentro de message)
+ALLOWED_UPDATES = [Update.MESSAGE]
+
+# Programas y mints de Solana
+TOKEN_PROGRAM_ID = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+TOKEN_2022_PROGRAM_ID = "TokenzQdBNbLqP5VEhdkAS6EPFLC1PHnBqCXEpPxuEb"
+WRAPPED_SOL_MINT = "So11111111111111111111111111111111111111112"
+
+# Technical Analysis Parameters
+TA_PARAMS = {
+    'RSI_PERIOD': 14,
+    'RSI_OVERBOUGHT': 70,
+    'RSI_OVERSOLD': 30,
+    'MACD_FAST': 12,
+    'MACD_SLOW': 26,
+    'MACD_SIGNAL': 9,
+    'VOLUME_CHANGE_THRESHOLD': 50  # Percentage
+}
+
+# Reglas de análisis en el orden en que se muestran: (clave, mensaje, eleva el riesgo)
+ANALYSIS_RULES = [
+    ("price_up", "⚠️ Precio subió más de 20% en 24h", True),
+    ("price_down", "⚠️ Precio bajó más de 20% en 24h", True),
+    ("low_volume", "⚠️ Volumen bajo (<$10k)", True),
+    ("high_volume", "✅ Alto volumen (>$1M)", False),
+    ("few_holders", "⚠️ Pocos holders (<100)", True),
+    ("many_holders", "✅ Buena distribución (>1000 holders)", False),
+    ("new_token", "⚠️ Token muy nuevo (<7 días)", True),
+    ("established", "✅ Token establecido (>30 días)", False),
+    ("rsi_overbought", "⚠️ RSI en sobrecompra ({rsi:.0f})", True),
+    ("rsi_oversold", "⚠️ RSI en sobreventa ({rsi:.0f})", True),
+    ("macd_bullish", "✅ Cruce alcista del MACD", False),
+    ("macd_bearish", "⚠️ Cruce bajista del MACD", False),
+    ("volume_spike", "⚠️ Pico de volumen ({volume_change:+.0f}%)", True)
+]
+
+# Plantillas de los mensajes (Markdown). Los textos que vienen de fuera
+# (nombres y símbolos de tokens) se escapan antes de formatear.
+TRENDING_HEADER = "📈 *Tokens en Tendencia*\n_Actualizado hace {age}_\n"
+TRENDING_ENTRY = (
+    "\n*{symbol}* ({emoji}{change:+.2f}%)\n"
+    "💰 Precio: ${price:.6f}\n"
+    "📊 Vol 24h: ${volume:,.0f}\n"
+    "👥 Holders: {holders:,}\n"
+    "⚠️ Riesgo: {risk}\n"
+    "🔍 Análisis:\n{analysis}"
+)
+ANALYZE_MESSAGE = (
+    "*{name} ({symbol})*\n\n"
+    "💰 Precio: ${price:.6f}\n"
+    "📊 Cambio 24h: {emoji}{change:+.2f}%\n"
+    "💎 Market Cap: ${market_cap:,.0f}\n"
+    "📈 Vol 24h: ${volume:,.0f}\n"
+    "👥 Holders: {holders:,}\n"
+    "⚠️ Nivel de Riesgo: {risk}\n\n"
+    "🔍 *Análisis:*\n{analysis}"
+)
+PORTFOLIO_HEADER = "💰 *Tu Portfolio*\n"
+PORTFOLIO_ENTRY = (
+    "\n*{symbol}*\n"
+    "• Cantidad: {amount:,.4f}\n"
+    "• Precio: ${price:.6f}\n"
+    "• Cambio 24h: {emoji}{change:+.2f}%\n"
+    "• Valor: ${value:,.2f}"
+)
+PORTFOLIO_ERROR_ENTRY = (
+    "\n*Token {short_mint}*\n"
+    "• Cantidad: {amount:,.4f}\n"
+    "• Error: No se pudo obtener información"
+)
+PORTFOLIO_TOTAL = "\n\n💵 *Valor Total:* ${total:,.2f}"
+
+class TechnicalAnalyzer:
+    """Indicadores técnicos calculados para muchos tokens a la vez.
+
+    Cada fila de las matrices es un token y cada columna un punto del
+    histórico; todas las operaciones son vectoriales sobre la matriz completa.
+    """
+
+    def __init__(self, params: dict = None):
+        self.params = params or TA_PARAMS
+
+    @staticmethod
+    def to_matrix(series_list: list):
+        """Alinear series de distinto largo por el final rellenando con NaN"""
+        import numpy as np
+
+        length = max((len(series) for series in series_list), default=0)
+        matrix = np.full((len(series_list), length), np.nan)
+        for row, series in enumerate(series_list):
+            if len(series):
+                matrix[row, length - len(series):] = np.asarray(series, dtype=float)
+        return matrix
+
+    @staticmethod
+    def ema(matrix, span: float = None, alpha: float = None, min_periods: int = 0):
+        """Media móvil exponencial por filas (los NaN iniciales se ignoran)"""
+        import pandas as pd
+
+        frame = pd.DataFrame(matrix.T)
+        return frame.ewm(span=span, alpha=alpha, adjust=False, min_periods=min_periods).mean().to_numpy().T
+
+    def rsi(self, prices):
+        """RSI de Wilder por filas"""
+        import numpy as np
+
+        period = self.params['RSI_PERIOD']
+        delta = np.diff(prices, axis=1)
+        gains = np.clip(delta, 0, None)
+        losses = np.clip(-delta, 0, None)
+        avg_gain = self.ema(gains, alpha=1 / period, min_periods=period)
+        avg_loss = self.ema(losses, alpha=1 / period, min_periods=period)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+        return np.where((avg_loss == 0) & (avg_gain > 0), 100.0, rsi)
+
+    def macd(self, prices):
+        """Línea MACD, señal e histograma por filas"""
+        macd = (self.ema(prices, span=self.params['MACD_FAST'])
+                - self.ema(prices, span=self.params['MACD_SLOW'], min_periods=self.params['MACD_SLOW']))
+        signal = self.ema(macd, span=self.params['MACD_SIGNAL'], min_periods=self.params['MACD_SIGNAL'])
+        return macd, signal, macd - signal
+
+    def volume_change(self, volumes):
+        """Variación porcentual del último volumen frente a la media previa"""
+        import numpy as np
+
+        if volumes.shape[1] < 2:
+            return np.full(volumes.shape[0], np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            baseline = np.nanmean(volumes[:, :-1], axis=1)
+            return (volumes[:, -1] - baseline) / baseline * 100
+
+    def compute(self, price_series: list, volume_series: list) -> dict:
+        """Calcular los indicadores de todos los tokens; devuelve arrays de una entrada por token"""
+        import numpy as np
+
+        prices = self.to_matrix(price_series)
+        volumes = self.to_matrix(volume_series)
+        count = len(price_series)
+        if prices.shape[1] < 2:
+            empty = np.full(count, np.nan)
+            return {
+                "rsi": empty, "macd": empty, "macd_signal": empty, "macd_hist": empty,
+                "macd_cross": np.zeros(count, dtype=int), "volume_change": empty,
+                "volume_spike": np.zeros(count, dtype=bool)
+            }
+
+        rsi = self.rsi(prices)[:, -1]
+        macd, signal, hist = self.macd(prices)
+        # Cruce: el histograma cambia de signo entre los dos últimos puntos
+        macd_cross = np.where(
+            (hist[:, -2] <= 0) & (hist[:, -1] > 0), 1,
+            np.where((hist[:, -2] >= 0) & (hist[:, -1] < 0), -1, 0)
+        )
+        volume_change = self.volume_change(volumes)
+        return {
+            "rsi": rsi,
+            "macd": macd[:, -1],
+            "macd_signal": signal[:, -1],
+            "macd_hist": hist[:, -1],
+            "macd_cross": macd_cross,
+            "volume_change": volume_change,
+            "volume_spike": volume_change > self.params['VOLUME_CHANGE_THRESHOLD']
+        }
+
+class Histogram:
+    """Histograma de latencias con buckets fijos (segundos)"""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimación del cuantil q a partir de los buckets (límite superior)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.BUCKETS + (float('inf'),), self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float('inf')
+
+class Metrics:
+    """Registro de métricas en proceso (contadores, gauges e histogramas)
+    exportable en formato de texto de Prometheus"""
+
+    def __init__(self):
+        self.counters: Dict[tuple, float] = {}
+        self.gauges: Dict[tuple, float] = {}
+        self.histograms: Dict[tuple, Histogram] = {}
+        self.collectors = []  # Funciones que devuelven [(nombre, etiquetas, valor)] al exportar
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram()
+        self.histograms[key].observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Medir la duración de un bloque; las excepciones cuentan como error"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc(f"{name}_errors_total", **labels)
+            raise
+        finally:
+            self.observe(f"{name}_seconds", time.perf_counter() - started, **labels)
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def collect(self) -> Dict[tuple, float]:
+        """Gauges actuales incluyendo los de los colectores"""
+        gauges = dict(self.gauges)
+        for collector in self.collectors:
+            try:
+                for name, labels, value in collector():
+                    gauges[self._key(name, labels)] = value
+            except Exception as e:
+                print(f"Error en colector de métricas: {str(e)}")
+        return gauges
+
+    @staticmethod
+    def _format(name: str, labels: tuple, extra: tuple = ()) -> str:
+        pairs = ",".join(f'{k}="{v}"' for k, v in labels + extra)
+        return f"{name}{{{pairs}}}" if pairs else name
+
+    def render_prometheus(self) -> str:
+        """Exportar todas las métricas en formato de texto de Prometheus"""
+        lines = []
+        for (name, labels), value in sorted(self.counters.items()):
+            lines.append(f"{self._format(name, labels)} {value}")
+        for (name, labels), value in sorted(self.collect().items()):
+            lines.append(f"{self._format(name, labels)} {value}")
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, count in zip(Histogram.BUCKETS + ("+Inf",), histogram.counts):
+                cumulative += count
+                lines.append(f"{self._format(name + '_bucket', labels, (('le', bound),))} {cumulative}")
+            lines.append(f"{self._format(name + '_sum', labels)} {histogram.sum}")
+            lines.append(f"{self._format(name + '_count', labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+_profiling = False
+
+def instrumented(name: str):
+    """Decorador para handlers: latencia, errores y perfilado cProfile por muestreo"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            global _profiling
+            profiler = None
+            if Config.PROFILE_SAMPLE_RATE and not _profiling and random.random() < Config.PROFILE_SAMPLE_RATE:
+                # Mientras el handler espera, el perfil incluye también al resto de tareas del loop
+                _profiling = True
+                profiler = cProfile.Profile()
+                profiler.enable()
+            try:
+                with metrics.timer("handler", handler=name):
+                    return await handler(*args, **kwargs)
+            finally:
+                if profiler:
+                    profiler.disable()
+                    _profiling = False
+                    os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+                    profiler.dump_stats(os.path.join(Config.PROFILE_DIR, f"{name}-{int(time.time() * 1000)}.prof"))
+        return wrapper
+    return decorator
+
+async def monitor_event_loop_lag():
+    """Medir cuánto se retrasa el event loop respecto a un sleep periódico"""
+    while True:
+        expected = time.perf_counter() + Config.LOOP_LAG_INTERVAL
+        await asyncio.sleep(Config.LOOP_LAG_INTERVAL)
+        lag = max(0.0, time.perf_counter() - expected)
+        metrics.observe("event_loop_lag_seconds", lag)
+        metrics.set_gauge("event_loop_lag_last_seconds", lag)
+
+# Prioridad de las peticiones salientes: los comandos del usuario van antes
+# que los refrescos en segundo plano (ver background_job)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+request_priority = contextvars.ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+
+def background_job(callback):
+    """Envolver una tarea del job queue para que sus peticiones tengan prioridad baja"""
+    async def run(context: ContextTypes.DEFAULT_TYPE):
+        request_priority.set(PRIORITY_BACKGROUND)
+        await callback(context)
+    return run
+
+def parse_rate_limit(spec: str) -> tuple:
+    """Convertir "peticiones_por_segundo/ráfaga" en (rate, burst)"""
+    rate, _, burst = spec.partition("/")
+    return float(rate), float(burst or rate)
+
+class ProviderScheduler:
+    """Planificador de peticiones a un proveedor.
+
+    Un token bucket limita el ritmo de salida; cuando no quedan tokens las
+    peticiones esperan en una cola con prioridad (interactivas primero, en
+    orden de llegada dentro de cada prioridad). Un 429 vacía el bucket y
+    pausa al proveedor en lugar de reintentar a ciegas.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = []  # heap de (prioridad, orden, futuro, clave)
+        self._order = itertools.count()
+        self._dispatcher = None
+        self.requests = 0
+        self.throttled = 0
+        self.queued = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE, key=None):
+        """Esperar turno para enviar una petición; `key` permite subirle la prioridad con promote"""
+        started = time.monotonic()
+        self._refill()
+        if not self._waiters and self.tokens >= 1 and started >= self._paused_until:
+            self.tokens -= 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._order), future, key))
+            self.queued += 1
+            if self._dispatcher is None or self._dispatcher.done():
+                self._dispatcher = asyncio.ensure_future(self._dispatch())
+            await future
+
+        waited = time.monotonic() - started
+        self.requests += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+    async def _dispatch(self):
+        """Conceder tokens a la cola a medida que se recargan"""
+        while self._waiters:
+            self._refill()
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                continue
+            _, _, future, _ = heapq.heappop(self._waiters)
+            if future.done():
+                continue  # La petición se canceló mientras esperaba
+            self.tokens -= 1
+            future.set_result(None)
+
+    def promote(self, key, priority: int):
+        """Subir a `priority` las peticiones en cola con esta clave (conservan su orden de llegada)"""
+        if any(k == key and p > priority for p, _, _, k in self._waiters):
+            self._waiters = [
+                (min(p, priority) if k == key else p, order, future, k)
+                for p, order, future, k in self._waiters
+            ]
+            heapq.heapify(self._waiters)
+
+    def penalize(self, delay: float):
+        """El proveedor respondió 429: vaciar el bucket y pausar `delay` segundos"""
+        self.throttled += 1
+        self.tokens = 0
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "tokens": round(self.tokens, 2),
+            "queue_depth": len(self._waiters),
+            "requests": self.requests,
+            "queued": self.queued,
+            "throttled": self.throttled,
+            "queue_wait_avg": self.wait_total / self.requests if self.requests else 0.0,
+            "queue_wait_max": self.wait_max
+        }
+
+class HttpClient:
+    """Cliente HTTP asíncrono compartido con pool de conexiones keep-alive,
+    límite de concurrencia y de ritmo por proveedor, timeouts, reintentos con
+    backoff y deduplicación de GETs idénticos en vuelo"""
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self):
+        self._client = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._schedulers: Dict[str, ProviderScheduler] = {}
+        self._rate_limits = {}
+        for item in filter(None, Config.PROVIDER_RATE_LIMITS.split(",")):
+            host, _, spec = item.strip().partition("=")
+            self._rate_limits[host] = parse_rate_limit(spec)
+        self._inflight_gets: Dict[tuple, asyncio.Future] = {}
+        self._inflight_priority: Dict[tuple, int] = {}  # Prioridad más alta entre quienes esperan el GET
+        self.deduplicated = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Crear el cliente la primera vez que se usa (dentro del event loop)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(Config.HTTP_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=Config.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=Config.HTTP_MAX_KEEPALIVE
+                ),
+                headers={"Accept": "application/json"},
+                follow_redirects=True
+            )
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(Config.HTTP_PER_HOST_LIMIT)
+        return self._host_limits[host]
+
+    def scheduler(self, url: str) -> ProviderScheduler:
+        """Planificador del proveedor (host) de una URL"""
+        host = urlsplit(url).hostname or ""
+        if host not in self._schedulers:
+            rate, burst = self._rate_limits.get(host) or parse_rate_limit(Config.PROVIDER_DEFAULT_RATE_LIMIT)
+            self._schedulers[host] = ProviderScheduler(host, rate, burst)
+        return self._schedulers[host]
+
+    async def request(self, method: str, url: str, dedup_key: tuple = None, **kwargs) -> httpx.Response:
+        """Ejecutar una petición reintentando errores de red, 429 y 5xx"""
+        return await self._send(method, url, dedup_key, False, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs):
+        """Como request, pero el cuerpo se lee en streaming dentro del bloque.
+
+        Los 429 y 5xx se reintentan antes de empezar a leer el cuerpo; el hueco
+        del límite por host se mantiene hasta cerrar la respuesta.
+        """
+        response = await self._send(method, url, None, True, **kwargs)
+        try:
+            yield response
+        finally:
+            await response.aclose()
+            self._host_limit(url).release()
+
+    async def _send(self, method: str, url: str, dedup_key: tuple, stream: bool, **kwargs) -> httpx.Response:
+        scheduler = self.scheduler(url)
+        last_error = None
+        for attempt in range(Config.HTTP_RETRIES + 1):
+            # Un GET compartido usa la prioridad más alta de quienes lo esperan
+            priority = self._inflight_priority.get(dedup_key, request_priority.get())
+            await scheduler.acquire(priority, dedup_key)
+            started = time.perf_counter()
+            limit = self._host_limit(url)
+            await limit.acquire()
+            keep_slot = False  # Un stream correcto conserva el hueco hasta que se cierra
+            try:
+                response = await self.client.send(self.client.build_request(method, url, **kwargs), stream=stream)
+                metrics.observe("upstream_seconds", time.perf_counter() - started, provider=scheduler.name)
+                metrics.inc("upstream_requests_total", provider=scheduler.name, status=response.status_code)
+                if response.status_code not in self.RETRY_STATUS:
+                    if response.is_error:
+                        await response.aclose()
+                    response.raise_for_status()
+                    keep_slot = stream
+                    return response
+                await response.aclose()
+                last_error = httpx.HTTPStatusError(
+                    f"HTTP {response.status_code}", request=response.request, response=response
+                )
+                retry_after = response.headers.get("Retry-After")
+            except httpx.TransportError as e:
+                metrics.inc("upstream_requests_total", provider=scheduler.name, status="error")
+                last_error = e
+                response = None
+                retry_after = None
+            finally:
+                if not keep_slot:
+                    limit.release()
+
+            if attempt < Config.HTTP_RETRIES:
+                delay = Config.HTTP_BACKOFF * (2 ** attempt) * (1 + random.random())
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                if response is not None and response.status_code == 429:
+                    # La pausa la aplica el planificador a todas las peticiones del proveedor
+                    scheduler.penalize(delay)
+                else:
+                    await asyncio.sleep(delay)
+        raise last_error
+
+    async def _get_json(self, url: str, params: dict, key: tuple):
+        response = await self.request("GET", url, dedup_key=key, params=params)
+        return response.json()
+
+    async def get_json(self, url: str, params: dict = None):
+        """GET que devuelve el cuerpo decodificado como JSON.
+
+        Si ya hay una petición idéntica en vuelo se comparte su resultado; si
+        quien se une tiene más prioridad, la petición compartida la hereda.
+        """
+        key = (url, tuple(sorted((params or {}).items())))
+        priority = request_priority.get()
+        task = self._inflight_gets.get(key)
+        if task is None:
+            self._inflight_priority[key] = priority
+            task = asyncio.ensure_future(self._get_json(url, params, key))
+            self._inflight_gets[key] = task
+
+            def done(finished: asyncio.Future):
+                self._inflight_gets.pop(key, None)
+                self._inflight_priority.pop(key, None)
+                if not finished.cancelled():
+                    finished.exception()  # Evitar avisos de excepción no recuperada
+
+            task.add_done_callback(done)
+        else:
+            self.deduplicated += 1
+            if priority < self._inflight_priority[key]:
+                self._inflight_priority[key] = priority
+                self.scheduler(url).promote(key, priority)
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        """Métricas por proveedor (esperas en cola, 429, etc.)"""
+        return {
+            "providers": {host: scheduler.stats() for host, scheduler in self._schedulers.items()},
+            "deduplicated": self.deduplicated
+        }
+
+    async def post_json(self, url: str, payload):
+        """POST con cuerpo JSON que devuelve la respuesta decodificada"""
+        response = await self.request("POST", url, json=payload)
+        return response.json()
+
+    async def stream_json_array(self, url: str):
+        """Recorrer un array JSON grande elemento a elemento sin cargarlo entero en memoria"""
+        decoder = json.JSONDecoder()
+        async with self.stream("GET", url) as response:
+            buffer = ""
+            started = False
+            async for chunk in response.aiter_text():
+                buffer += chunk
+                pos = 0
+                while True:
+                    # Saltar espacios y separadores entre elementos
+                    while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                        pos += 1
+                    if pos >= len(buffer) or buffer[pos] == "]":
+                        break
+                    if not started:
+                        if buffer[pos] != "[":
+                            raise ValueError("Se esperaba un array JSON")
+                        started = True
+                        pos += 1
+                        continue
+                    try:
+                        item, end = decoder.raw_decode(buffer, pos)
+                    except json.JSONDecodeError:
+                        break  # Elemento incompleto: esperar al siguiente bloque
+                    if not isinstance(item, (dict, list, str)) and (end == len(buffer) or buffer[end] not in " \t\r\n,]"):
+                        # Un número (o literal) cortado entre bloques: "123" de "12345",
+                        # "-1.5" de "-1.5e3"; se decodifica cuando llegue su separador
+                        break
+                    pos = end
+                    yield item
+                buffer = buffer[pos:]
+
+            if buffer.strip() != "]":
+                raise ValueError("Array JSON incompleto o inválido")
+
+    async def close(self):
+        """Cerrar las conexiones del pool"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class TTLCache:
+    """Caché en memoria con TTL y expulsión LRU.
+
+    Las consultas concurrentes de una misma clave comparten una sola descarga
+    (salvo que una interactiva llegue mientras la descarga es de segundo plano)
+    y las entradas caducadas se siguen sirviendo mientras se refrescan en segundo plano.
+    """
+
+    def __init__(self, name: str, ttl: float, max_size: int = None):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = ttl * Config.CACHE_STALE_FACTOR
+        self.max_size = max_size or Config.CACHE_MAX_SIZE
+        self._entries = OrderedDict()  # clave -> (valor, momento en que se guardó)
+        self._inflight: Dict[tuple, asyncio.Future] = {}  # (clave, prioridad) -> futuro
+        self._tasks = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _lookup(self, key):
+        """Devolver (valor, estado) con estado 'fresh', 'stale' o None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+        value, stored_at = entry
+        age = time.monotonic() - stored_at
+        if age > self.ttl + self.stale_ttl:
+            del self._entries[key]
+            return None, None
+        self._entries.move_to_end(key)
+        return value, "fresh" if age <= self.ttl else "stale"
+
+    def get(self, key, allow_stale: bool = False):
+        """Leer una entrada sin descargar nada"""
+        value, state = self._lookup(key)
+        if state == "fresh" or (allow_stale and state == "stale"):
+            return value
+        return None
+
+    def set(self, key, value):
+        """Guardar una entrada expulsando las menos usadas si se supera el tamaño"""
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _joinable(self, key, priority: int) -> asyncio.Future:
+        """Descarga en vuelo de la clave con prioridad igual o mayor que `priority`.
+
+        Una petición interactiva no se une a una de segundo plano: esperaría
+        en la cola del proveedor detrás de todas las interactivas.
+        """
+        for inflight_priority in (PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND):
+            if inflight_priority <= priority and (key, inflight_priority) in self._inflight:
+                return self._inflight[(key, inflight_priority)]
+        return None
+
+    def _start(self, keys: list, fetch_many, priority: int) -> Dict[str, asyncio.Future]:
+        """Lanzar una descarga para `keys` registrando un futuro por clave"""
+        loop = asyncio.get_running_loop()
+        futures = {key: loop.create_future() for key in keys}
+        self._inflight.update(((key, priority), future) for key, future in futures.items())
+
+        async def run():
+            values = {}
+            request_priority.set(priority)
+            try:
+                values = await fetch_many(keys) or {}
+            except Exception as e:
+                print(f"Error refrescando caché {self.name}: {str(e)}")
+            finally:
+                for key, future in futures.items():
+                    value = values.get(key)
+                    if value is not None:
+                        self.set(key, value)
+                    self._inflight.pop((key, priority), None)
+                    if not future.done():
+                        future.set_result(value)
+
+        task = asyncio.ensure_future(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return futures
+
+    async def get_many_or_fetch(self, keys: list, fetch_many) -> dict:
+        """Resolver muchas claves; las ausentes se piden juntas con fetch_many(claves) -> dict"""
+        priority = request_priority.get()
+        results, waiting, missing, refresh = {}, {}, [], []
+        for key in keys:
+            value, state = self._lookup(key)
+            if state == "fresh":
+                self.hits += 1
+                results[key] = value
+            elif state == "stale":
+                self.stale_hits += 1
+                results[key] = value
+                if self._joinable(key, PRIORITY_BACKGROUND) is None:
+                    refresh.append(key)
+            elif self._joinable(key, priority) is not None:
+                self.coalesced += 1
+                waiting[key] = self._joinable(key, priority)
+            else:
+                self.misses += 1
+                missing.append(key)
+
+        if refresh:
+            self._start(refresh, fetch_many, PRIORITY_BACKGROUND)
+        if missing:
+            waiting.update(self._start(missing, fetch_many, priority))
+
+        for key, future in waiting.items():
+            value = await asyncio.shield(future)
+            if value is not None:
+                results[key] = value
+        return results
+
+    async def get_or_fetch(self, key, fetch):
+        """Resolver una clave usando fetch() -> valor si no está en caché"""
+        async def fetch_many(keys):
+            return {key: await fetch()}
+
+        results = await self.get_many_or_fetch([key], fetch_many)
+        return results.get(key)
+
+    def stats(self) -> dict:
+        """Estadísticas de aciertos y fallos"""
+        lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.stale_hits + self.coalesced) / lookups if lookups else 0.0
+        }
+
+class PriceHistoryStore:
+    """Histórico local de precios: un fichero de solo-añadir por mint.
+
+    Cada registro ocupa 24 bytes (timestamp int64, precio y volumen float64)
+    y los ficheros se leen con np.memmap, de modo que las ventanas devueltas
+    son vistas sobre el fichero sin copiar datos. Los registros se añaden en
+    orden temporal, así que se puede buscar por tiempo con searchsorted.
+    """
+
+    MINT_CHARS = frozenset(base58.alphabet.decode())
+
+    def __init__(self, directory: str = None, max_tracked: int = None):
+        self.directory = directory or Config.HISTORY_STORE_DIR
+        self.max_tracked = max_tracked or Config.HISTORY_MAX_TRACKED
+        self.tracked = OrderedDict()  # Mints que el colector mantiene al día (LRU)
+        self._maps = OrderedDict()  # mint -> (registros, memmap)
+        self.appended = 0
+
+    @staticmethod
+    def record_dtype():
+        import numpy as np
+        return np.dtype([("time", "<i8"), ("price", "<f8"), ("volume", "<f8")])
+
+    def valid_mint(self, mint: str) -> bool:
+        """Solo direcciones base58: el mint se usa como nombre de fichero"""
+        return 32 <= len(mint) <= 44 and set(mint) <= self.MINT_CHARS
+
+    def _path(self, mint: str) -> str:
+        return os.path.join(self.directory, f"{mint}.bin")
+
+    def read(self, mint: str):
+        """Todos los registros del mint como memmap de solo lectura (o None)"""
+        import numpy as np
+
+        dtype = self.record_dtype()
+        try:
+            # Un registro a medias al final (escritura interrumpida) se ignora
+            count = os.path.getsize(self._path(mint)) // dtype.itemsize
+        except OSError:
+            return None
+        if not count:
+            return None
+        cached = self._maps.get(mint)
+        if cached and cached[0] == count:
+            self._maps.move_to_end(mint)
+            return cached[1]
+        # El fichero creció (o no estaba abierto): volver a mapearlo con el tamaño actual
+        records = np.memmap(self._path(mint), dtype=dtype, mode="r", shape=(count,))
+        self._maps[mint] = (count, records)
+        self._maps.move_to_end(mint)
+        while len(self._maps) > self.max_tracked:
+            self._maps.popitem(last=False)
+        return records
+
+    def last_time(self, mint: str) -> int:
+        records = self.read(mint)
+        return int(records["time"][-1]) if records is not None else 0
+
+    @staticmethod
+    @contextmanager
+    def _locked(f):
+        """Bloqueo exclusivo del fichero mientras dura el bloque (entre procesos)"""
+        try:
+            import fcntl
+        except ImportError:  # Windows: sin flock, un único proceso escribe
+            yield
+            return
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            f.flush()
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def append(self, mint: str, times, prices, volumes) -> int:
+        """Añadir los puntos posteriores al último guardado; devuelve cuántos se añadieron"""
+        import numpy as np
+
+        if not self.valid_mint(mint):
+            return 0
+        dtype = self.record_dtype()
+        times = np.asarray(times, dtype=np.int64)
+        if not times.size:
+            return 0  # Sin puntos no se crea el fichero
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(mint), "a+b") as f, self._locked(f):
+            # Una escritura interrumpida puede dejar un registro a medias al final:
+            # se descarta para que los nuevos registros queden alineados
+            size = os.fstat(f.fileno()).st_size
+            whole = size - size % dtype.itemsize
+            if whole != size:
+                f.truncate(whole)
+            # El último tiempo se lee dentro del bloqueo: otro proceso puede haber añadido puntos
+            last = 0
+            if whole:
+                f.seek(whole - dtype.itemsize)
+                last = int(np.frombuffer(f.read(dtype.itemsize), dtype=dtype)["time"][0])
+            newer = times > last
+            if not newer.any():
+                return 0
+            records = np.empty(int(newer.sum()), dtype=dtype)
+            records["time"] = times[newer]
+            records["price"] = np.asarray(prices, dtype=float)[newer]
+            records["volume"] = np.asarray(volumes, dtype=float)[newer]
+            records.sort(order="time", kind="stable")
+            f.write(records.tobytes())
+        self.appended += len(records)
+        metrics.inc("history_points_appended_total", len(records))
+        return len(records)
+
+    def window(self, mint: str, seconds: float, max_lag: float):
+        """Registros de los últimos `seconds` (vista del memmap) si el último punto es reciente"""
+        import numpy as np
+
+        if not self.valid_mint(mint):
+            return None
+        records = self.read(mint)
+        now = time.time()
+        if records is None or records["time"][-1] < now - max_lag:
+            return None
+        return records[np.searchsorted(records["time"], now - seconds):]
+
+    def track(self, mint: str):
+        """Pedir al colector que mantenga al día el histórico del mint"""
+        if not self.valid_mint(mint):
+            return
+        self.tracked[mint] = None
+        self.tracked.move_to_end(mint)
+        while len(self.tracked) > self.max_tracked:
+            self.tracked.popitem(last=False)
+
+class ExecutorBusy(RuntimeError):
+    """La cola del ejecutor está llena"""
+
+class JobExpired(RuntimeError):
+    """El update que originó el trabajo caducó antes de que terminara"""
+
+class ManagedExecutor:
+    """Pool de procesos (CPU) o de hilos (E/S bloqueante) con cola acotada.
+
+    Como mucho `workers` trabajos se ejecutan a la vez y `queue_size` esperan
+    turno; con la cola llena se rechaza el trabajo (ExecutorBusy) en lugar de
+    acumular latencia. Cada trabajo puede llevar una fecha límite (la del
+    update que lo originó): si vence mientras espera no llega a ejecutarse, y
+    si vence mientras corre se descarta su resultado.
+    """
+
+    def __init__(self, name: str, workers: int, queue_size: int, processes: bool = False):
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self.processes = processes
+        self._executor = None
+        self._slots = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.expired = 0
+
+    @property
+    def executor(self):
+        """Crear el pool al primer uso"""
+        if self._executor is None:
+            if self.processes:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+
+                # "spawn": los procesos no heredan el event loop ni las conexiones abiertas
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                from concurrent.futures import ThreadPoolExecutor
+
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix=self.name)
+        return self._executor
+
+    @staticmethod
+    def _remaining(deadline: float):
+        if deadline is None:
+            return None
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise asyncio.TimeoutError
+        return remaining
+
+    async def run(self, fn, *args, deadline: float = None):
+        """Ejecutar fn(*args) en el pool; `deadline` es un instante de time.time()"""
+        if self.pending >= self.workers + self.queue_size:
+            self.rejected += 1
+            metrics.inc("executor_rejected_total", executor=self.name)
+            raise ExecutorBusy(f"Ejecutor {self.name} saturado")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+
+        loop = asyncio.get_running_loop()
+        queued_at = time.perf_counter()
+        self.pending += 1
+        try:
+            timeout = self._remaining(deadline)
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+            try:
+                future = self.executor.submit(fn, *args)
+            except Exception:
+                self._slots.release()
+                raise
+            # El hueco se libera cuando el trabajo termina de verdad, aunque ya nadie lo espere
+            future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._slots.release))
+            metrics.observe("executor_queue_seconds", time.perf_counter() - queued_at, executor=self.name)
+
+            with metrics.timer("executor", executor=self.name):
+                result = await asyncio.wait_for(asyncio.wrap_future(future), self._remaining(deadline))
+            self.completed += 1
+            return result
+        except asyncio.TimeoutError:
+            self.expired += 1
+            metrics.inc("executor_expired_total", executor=self.name)
+            raise JobExpired(f"Trabajo caducado en {self.name}") from None
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        """Cancelar lo pendiente y cerrar el pool sin esperar a lo que está en curso"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "workers": self.workers,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "expired": self.expired
+        }
+
+def update_deadline(update: Update) -> float:
+    """Instante (time.time()) a partir del cual ya no tiene sentido responder al update"""
+    date = getattr(update.message, 'date', None)
+    received = date.timestamp() if date else time.time()
+    return received + Config.UPDATE_EXPIRY
+
+# Trabajos para el pool de procesos: funciones de módulo para que se puedan
+# enviar (pickle) a otro proceso; importan sus dependencias al ejecutarse.
+
+def render_qr_png(data: str) -> bytes:
+    """Código QR de `data` en PNG"""
+    import io
+    import qrcode
+
+    qr = qrcode.QRCode(box_size=8, border=3, error_correction=qrcode.constants.ERROR_CORRECT_M)
+    qr.add_data(data)
+    qr.make(fit=True)
+    buffer = io.BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def render_price_chart(title: str, prices: list, width: int = 800, height: int = 400) -> bytes:
+    """Gráfico de línea de una serie de precios en PNG"""
+    import io
+    import math
+    from PIL import Image, ImageDraw, ImageFont
+
+    points = [p for p in prices if p is not None and not math.isnan(p)]
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+    draw.text((12, 8), title, fill="black", font=font)
+
+    left, top, right, bottom = 70, 32, width - 16, height - 24
+    for i in range(5):
+        y = top + (bottom - top) * i / 4
+        draw.line([(left, y), (right, y)], fill="#e5e5e5")
+
+    if len(points) > 1:
+        low, high = min(points), max(points)
+        span = (high - low) or abs(high) or 1.0
+        step = (right - left) / (len(points) - 1)
+        line = [
+            (left + i * step, bottom - (price - low) / span * (bottom - top))
+            for i, price in enumerate(points)
+        ]
+        color = "#16a34a" if points[-1] >= points[0] else "#dc2626"
+        draw.line(line, fill=color, width=2)
+        draw.text((6, top - 6), f"{high:.6g}", fill="#555555", font=font)
+        draw.text((6, bottom - 6), f"{low:.6g}", fill="#555555", font=font)
+    else:
+        draw.text((left, height // 2), "Sin histórico de precios", fill="#555555", font=font)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+class BrowserPool:
+    """Pool acotado de navegadores headless reutilizables.
+
+    Los navegadores se crean solo cuando se piden y se cierran tras
+    Config.BROWSER_IDLE_TIMEOUT segundos sin uso (ver reap_idle).
+    """
+
+    def __init__(self, size: int = None, idle_timeout: float = None, executor: "ManagedExecutor" = None):
+        self.size = size or Config.BROWSER_POOL_SIZE
+        self.idle_timeout = idle_timeout or Config.BROWSER_IDLE_TIMEOUT
+        self.executor = executor or ManagedExecutor("io", Config.THREAD_POOL_SIZE, Config.EXECUTOR_QUEUE_SIZE)
+        self._slots = asyncio.Semaphore(self.size)
+        self._idle = []  # [(driver, último uso)]
+
+    @staticmethod
+    def _create_driver():
+        """Configure Selenium for headless browsing"""
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.chrome.options import Options
+
+        chrome_options = Options()
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--log-level=3")
+        return webdriver.Chrome(service=Service(), options=chrome_options)
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"Error cerrando navegador: {str(e)}")
+
+    @asynccontextmanager
+    async def driver(self):
+        """Prestar un navegador del pool, creándolo si no hay ninguno libre"""
+        async with self._slots:
+            if self._idle:
+                driver, _ = self._idle.pop()
+            else:
+                driver = await self.executor.run(self._create_driver)
+
+            healthy = False
+            try:
+                yield driver
+                healthy = True
+            finally:
+                # Un navegador que falló puede quedar en mal estado: no se reutiliza
+                if healthy:
+                    self._idle.append((driver, time.monotonic()))
+                else:
+                    await self.executor.run(self._quit, driver)
+
+    async def reap_idle(self, context: ContextTypes.DEFAULT_TYPE = None):
+        """Cerrar los navegadores que llevan demasiado tiempo sin usarse"""
+        now = time.monotonic()
+        expired = [driver for driver, last_used in self._idle if now - last_used > self.idle_timeout]
+        self._idle = [(driver, last_used) for driver, last_used in self._idle
+                      if now - last_used <= self.idle_timeout]
+        for driver in expired:
+            await self.executor.run(self._quit, driver)
+
+    def shutdown(self):
+        """Cerrar todos los navegadores libres"""
+        idle, self._idle = self._idle, []
+        for driver, _ in idle:
+            self._quit(driver)
+
+def intern_string(value):
+    """Internar símbolos y direcciones: los repetidos comparten una sola copia"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+class TokenInfo:
+    """Datos de un token en un registro compacto (__slots__ en lugar de un dict)"""
+
+    __slots__ = ("address", "name", "symbol", "price", "price_change_24h", "volume_24h",
+                 "market_cap", "holders", "created_at", "price_history", "volume_history",
+                 "partial", "indicators")
+
+    # Campos que se exponen en la API JSON (sin los históricos)
+    FIELDS = ("address", "name", "symbol", "price", "price_change_24h", "volume_24h",
+              "market_cap", "holders", "created_at", "indicators")
+
+    def __init__(self, address: str, name: str = None, symbol: str = None, price: float = 0.0,
+                 price_change_24h: float = 0.0, volume_24h: float = 0.0, market_cap: float = 0.0,
+                 holders: int = 0, created_at: int = None, price_history: array = None,
+                 volume_history: array = None, partial: bool = False, indicators: dict = None):
+        self.address = intern_string(address)
+        self.name = name
+        self.symbol = intern_string(symbol)
+        self.price = price
+        self.price_change_24h = price_change_24h
+        self.volume_24h = volume_24h
+        self.market_cap = market_cap
+        self.holders = holders
+        self.created_at = created_at
+        # Series de floats compactas (array o vista de numpy del histórico local);
+        # los puntos sin dato se guardan como NaN
+        self.price_history = price_history if price_history is not None else array('d')
+        self.volume_history = volume_history if volume_history is not None else array('d')
+        self.partial = partial
+        self.indicators = indicators
+
+    def to_dict(self) -> dict:
+        """Campos públicos para respuestas JSON"""
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+class TokenTable:
+    """Conjunto de tokens guardado por columnas.
+
+    Los valores numéricos viven en `array` contiguos que analyze_tokens lee
+    como arrays de numpy sin copiarlos; los textos son cadenas internadas.
+    Recorrer la tabla produce un TokenInfo por fila para los renderers.
+    """
+
+    FLOAT_COLUMNS = ("price", "price_change_24h", "volume_24h", "market_cap",
+                     "rsi", "macd", "macd_signal", "macd_hist", "macd_cross",
+                     "volume_change", "volume_spike")
+    INT_COLUMNS = ("holders", "created_at")
+    INDICATORS = ("rsi", "macd", "macd_signal", "macd_hist", "macd_cross",
+                  "volume_change", "volume_spike")
+
+    def __init__(self, tokens: List[TokenInfo] = ()):
+        self.addresses: List[str] = []
+        self.names: List[str] = []
+        self.symbols: List[str] = []
+        self.partial = array('b')
+        self.columns = {name: array('d') for name in self.FLOAT_COLUMNS}
+        self.columns.update((name, array('q')) for name in self.INT_COLUMNS)
+        for token in tokens:
+            self.append(token)
+
+    def append(self, token: TokenInfo):
+        self.addresses.append(intern_string(token.address))
+        self.names.append(token.name)
+        self.symbols.append(intern_string(token.symbol))
+        self.partial.append(bool(token.partial))
+        indicators = token.indicators or {}
+        for name in self.FLOAT_COLUMNS:
+            if name in self.INDICATORS:
+                value = indicators.get(name)
+            else:
+                value = getattr(token, name)
+            self.columns[name].append(float('nan') if value is None else float(value))
+        for name in self.INT_COLUMNS:
+            self.columns[name].append(int(getattr(token, name) or 0))
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def __getitem__(self, name: str):
+        """Columna como array de numpy que comparte memoria con la tabla"""
+        import numpy as np
+
+        column = self.columns[name]
+        return np.frombuffer(column, dtype=np.float64 if column.typecode == 'd' else np.int64)
+
+    def row(self, index: int) -> TokenInfo:
+        """Fila `index` como TokenInfo (sin históricos)"""
+        indicators = {name: self.columns[name][index] for name in self.INDICATORS}
+        indicators = {name: (None if value != value else value) for name, value in indicators.items()}
+        if indicators["macd_cross"] is not None:
+            indicators["macd_cross"] = int(indicators["macd_cross"])
+        if indicators["volume_spike"] is not None:
+            indicators["volume_spike"] = bool(indicators["volume_spike"])
+        return TokenInfo(
+            self.addresses[index],
+            name=self.names[index],
+            symbol=self.symbols[index],
+            price=self.columns["price"][index],
+            price_change_24h=self.columns["price_change_24h"][index],
+            volume_24h=self.columns["volume_24h"][index],
+            market_cap=self.columns["market_cap"][index],
+            holders=self.columns["holders"][index],
+            created_at=self.columns["created_at"][index],
+            partial=bool(self.partial[index]),
+            indicators=indicators
+        )
+
+    def __iter__(self):
+        return (self.row(i) for i in range(len(self)))
+
+class TokenAnalyzer:
+    def __init__(self, io_executor: "ManagedExecutor" = None):
+        self.http = HttpClient()
+        # Pool de hilos acotado para la E/S bloqueante (navegadores)
+        self.io_executor = io_executor or ManagedExecutor("io", Config.THREAD_POOL_SIZE, Config.EXECUTOR_QUEUE_SIZE)
+        self.metadata_cache = TTLCache("metadata", Config.METADATA_TTL)
+        self.market_cache = TTLCache("market", Config.MARKET_TTL)
+        self.price_cache = TTLCache("price", Config.PRICE_TTL)
+        self.history_cache = TTLCache("history", Config.HISTORY_TTL)
+        self.wallet_cache = TTLCache("wallet", Config.WALLET_TTL)
+        self.browser_pool = BrowserPool(executor=self.io_executor)
+        self.technical = TechnicalAnalyzer()
+        self.history_store = PriceHistoryStore()
+
+    def __del__(self):
+        """Cleanup Selenium drivers"""
+        try:
+            self.browser_pool.shutdown()
+        except Exception:
+            pass
+
+    async def scrape_page(self, url: str) -> str:
+        """Obtener el HTML renderizado de una página usando el pool de navegadores"""
+        async with self.browser_pool.driver() as driver:
+            def load():
+                driver.get(url)
+                return driver.page_source
+            return await self.io_executor.run(load)
+    
+    async def _fetch_source(self, source: str, url: str):
+        """Consultar una fuente con timeout propio; devuelve None si falla o tarda"""
+        try:
+            with metrics.timer("source", source=source):
+                return await asyncio.wait_for(self.http.get_json(url), Config.SOURCE_TIMEOUT)
+        except Exception as e:
+            print(f"Error consultando {source}: {type(e).__name__} {str(e)}")
+            return None
+
+    def _price_batches(self, mints: List[str]) -> List[List[str]]:
+        """Dividir mints en lotes que respeten el máximo de ids y de longitud de URL"""
+        base_length = len(f"{Config.JUPITER_API_BASE}/price?ids=")
+        batches, current, length = [], [], base_length
+        for mint in mints:
+            extra = len(mint) + (1 if current else 0)
+            if current and (len(current) >= Config.JUPITER_BATCH_SIZE
+                            or length + extra > Config.JUPITER_MAX_URL_LENGTH):
+                batches.append(current)
+                current, length = [], base_length
+                extra = len(mint)
+            current.append(mint)
+            length += extra
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _fetch_prices(self, mints: List[str]) -> Dict[str, float]:
+        """Descargar precios de Jupiter en lotes concurrentes"""
+        async def fetch_batch(batch: List[str]):
+            url = f"{Config.JUPITER_API_BASE}/price?ids={','.join(batch)}"
+            return await self._fetch_source("Jupiter", url)
+
+        prices = {}
+        for price_data in await asyncio.gather(*(fetch_batch(b) for b in self._price_batches(mints))):
+            for mint, entry in ((price_data or {}).get('data') or {}).items():
+                if entry and entry.get('price') is not None:
+                    prices[mint] = float(entry['price'])
+        return prices
+
+    async def get_prices(self, mints: List[str]) -> Dict[str, float]:
+        """Obtener precios de muchos tokens con pocas llamadas a Jupiter"""
+        mints = list(dict.fromkeys(m for m in mints if m))
+        if not mints:
+            return {}
+        return await self.price_cache.get_many_or_fetch(mints, self._fetch_prices)
+
+    async def _fetch_token_data(self, token_address: str) -> TokenInfo:
+        """Descargar datos del token de Raydium guardando aparte los metadatos estables"""
+        token_data = await self._fetch_source("Raydium", f"{Config.RAYDIUM_API_BASE}/token/{token_address}")
+        if not token_data:
+            return None
+        market = TokenInfo(
+            token_address,
+            name=token_data.get('name'),
+            symbol=token_data.get('symbol'),
+            volume_24h=float(token_data.get('volume24h', 0)),
+            market_cap=float(token_data.get('marketCap', 0)),
+            holders=token_data.get('holderCount', 0),
+            created_at=token_data.get('createdAt')
+        )
+        # La caché de metadatos comparte el mismo registro (solo usa nombre, símbolo y edad)
+        self.metadata_cache.set(token_address, market)
+        return market
+
+    async def _download_history(self, token_address: str) -> tuple:
+        """Descargar el histórico 1D de Raydium como tres series (tiempos, precios, volúmenes)"""
+        history_url = f"{Config.RAYDIUM_API_BASE}/price-history?address={token_address}&type=1D"
+        history_data = await self._fetch_source("Raydium history", history_url)
+        if not isinstance(history_data, list):
+            return None
+        nan = float('nan')
+        times = array('q', (int(p.get('time') or 0) for p in history_data))
+        prices = array('d', (nan if p.get('price') is None else p['price'] for p in history_data))
+        volumes = array('d', (nan if p.get('volume') is None else p['volume'] for p in history_data))
+        return times, prices, volumes
+
+    def _store_history(self, token_address: str, history: tuple) -> int:
+        """Añadir al histórico local los puntos nuevos de una descarga"""
+        try:
+            return self.history_store.append(token_address, *history)
+        except OSError as e:
+            print(f"Error guardando histórico de {token_address}: {str(e)}")
+            return 0
+
+    async def _fetch_history(self, token_address: str) -> tuple:
+        """Histórico de Raydium como dos series (precios, volúmenes); se guarda también en local"""
+        history = await self._download_history(token_address)
+        if history is None:
+            return None
+        self._store_history(token_address, history)
+        return history[1], history[2]
+
+    def local_history(self, token_address: str) -> tuple:
+        """Precios y volúmenes de la ventana de 24h desde el histórico local (vistas sin copia)"""
+        try:
+            window = self.history_store.window(token_address, Config.HISTORY_WINDOW, Config.HISTORY_MAX_LAG)
+        except (OSError, ValueError) as e:
+            print(f"Error leyendo histórico local de {token_address}: {str(e)}")
+            return None
+        if window is None or len(window) < 2:
+            return None
+        return window["price"], window["volume"]
+
+    async def collect_history(self, context: ContextTypes.DEFAULT_TYPE = None):
+        """Tarea periódica: traer los puntos nuevos de los mints seguidos al histórico local"""
+        mints = list(self.history_store.tracked)
+        limit = asyncio.Semaphore(Config.TRENDING_CONCURRENCY)
+
+        async def collect(mint: str) -> int:
+            async with limit:
+                history = await self._download_history(mint)
+            return self._store_history(mint, history) if history else 0
+
+        appended = await asyncio.gather(*(collect(mint) for mint in mints))
+        return sum(appended)
+
+    async def get_token_info(self, token_address: str, prices: Dict[str, float] = None) -> TokenInfo:
+        """Obtener información detallada de un token usando endpoints públicos
+
+        Si se pasan `prices` (obtenidos en lote con get_prices) no se consulta Jupiter.
+        """
+        try:
+            # Jupiter (precio), Raydium (datos del token) e histórico en paralelo.
+            # El histórico sale del almacén local si está al día; si no, de Raydium.
+            price_task = self.get_prices([token_address]) if prices is None else asyncio.sleep(0, prices)
+            local = self.local_history(token_address)
+            history_task = asyncio.sleep(0, local) if local else self.history_cache.get_or_fetch(
+                token_address, lambda: self._fetch_history(token_address)
+            )
+            prices, market, history = await asyncio.gather(
+                price_task,
+                self.market_cache.get_or_fetch(
+                    token_address, lambda: self._fetch_token_data(token_address)
+                ),
+                history_task
+            )
+
+            price = prices.get(token_address)
+            # Sin datos de mercado recientes: usar al menos nombre, símbolo y edad
+            metadata = market or self.metadata_cache.get(token_address, allow_stale=True)
+
+            # Si alguna fuente tardó demasiado devolvemos resultados parciales
+            if price is None and not metadata:
+                return None
+            self.history_store.track(token_address)
+
+            # Calcular cambio de precio usando el histórico de 24h
+            price_history, volume_history = history or (array('d'), array('d'))
+            price_change_24h = 0
+            if len(price_history) > 1:
+                old_price = float(price_history[0])
+                new_price = float(price_history[-1])
+                price_change_24h = ((new_price - old_price) / old_price) * 100
+
+            return TokenInfo(
+                token_address,
+                name=metadata.name if metadata else None,
+                symbol=(metadata and metadata.symbol) or f"{token_address[:4]}...{token_address[-4:]}",
+                price=float(price or 0),
+                price_change_24h=price_change_24h,
+                volume_24h=market.volume_24h if market else 0.0,
+                market_cap=market.market_cap if market else 0.0,
+                holders=market.holders if market else 0,
+                created_at=(metadata and metadata.created_at) or int(time.time()),
+                price_history=price_history,
+                volume_history=volume_history,
+                partial=price is None or not metadata or len(price_history) == 0
+            )
+        except Exception as e:
+            print(f"Error getting token info: {str(e)}")
+            return None
+
+    async def get_trending_tokens(self, top_n: int = None) -> TokenTable:
+        """Obtener tokens en tendencia usando Raydium"""
+        try:
+            top_n = top_n or Config.TRENDING_TOP_N
+
+            # Leer los pares de Raydium en streaming conservando solo el top N por volumen
+            url = f"{Config.RAYDIUM_API_BASE}/pairs"
+            top_pairs = []  # min-heap de (volumen, -orden, mint)
+
+            order = 0
+            async for pair in self.http.stream_json_array(url):
+                order += 1
+                try:
+                    volume = float(pair.get('volume24h', 0))
+                    if volume > 0 and 'tokenInfo' in pair:
+                        entry = (volume, -order, pair['tokenInfo']['mint'])
+                        if len(top_pairs) < top_n:
+                            heapq.heappush(top_pairs, entry)
+                        elif entry > top_pairs[0]:
+                            heapq.heapreplace(top_pairs, entry)
+                except (ValueError, TypeError, AttributeError, KeyError):
+                    continue
+
+            # Enriquecer los top N en paralelo (acotado)
+            mints = [mint for _, _, mint in sorted(top_pairs, reverse=True)]
+            prices = await self.get_prices(mints)
+            limit = asyncio.Semaphore(Config.TRENDING_CONCURRENCY)
+
+            async def enrich(mint: str):
+                async with limit:
+                    return await self.get_token_info(mint, prices)
+
+            trending = [token for token in await asyncio.gather(*(enrich(mint) for mint in mints)) if token]
+            self.add_indicators(trending)
+            return TokenTable(trending)
+        except Exception as e:
+            print(f"Error getting trending tokens: {str(e)}")
+            return TokenTable()
+
+    async def rpc_batch(self, calls: list) -> list:
+        """Varias llamadas JSON-RPC en una sola petición HTTP.
+
+        `calls` es una lista de (método, params); devuelve los resultados en el
+        mismo orden y lanza RuntimeError si alguna llamada falla.
+        """
+        if not calls:
+            return []
+        payload = [
+            {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+            for i, (method, params) in enumerate(calls)
+        ]
+        responses = await self.http.post_json(Config.SOLANA_RPC_URL, payload)
+        if isinstance(responses, dict):
+            # Algunos nodos responden con un único error si no aceptan el lote
+            raise RuntimeError(f"RPC batch: {(responses.get('error') or {}).get('message')}")
+
+        results = [None] * len(calls)
+        for response in responses:
+            if "error" in response:
+                method = calls[response["id"]][0]
+                raise RuntimeError(f"RPC {method}: {response['error'].get('message')}")
+            results[response["id"]] = response.get("result")
+        return results
+
+    async def _fetch_wallet_balances(self, owner: str) -> list:
+        """Leer las cuentas SPL y el SOL de una wallet con dos peticiones RPC en lote"""
+        # 1) Cuentas de token (Token y Token-2022) y balance de SOL
+        token_accounts, token2022_accounts, lamports = await self.rpc_batch([
+            ("getTokenAccountsByOwner", [owner, {"programId": program}, {"encoding": "base64"}])
+            for program in (TOKEN_PROGRAM_ID, TOKEN_2022_PROGRAM_ID)
+        ] + [("getBalance", [owner])])
+
+        # El SOL nativo cuenta como wSOL (mismo mint y 9 decimales) para no duplicar la posición
+        raw_amounts = {}
+        lamports = (lamports or {}).get("value") or 0
+        if lamports > 0:
+            raw_amounts[WRAPPED_SOL_MINT] = lamports
+        for account in (token_accounts or {}).get("value", []) + (token2022_accounts or {}).get("value", []):
+            data = base64.b64decode(account["account"]["data"][0])
+            mint = base58.b58encode(data[0:32]).decode()
+            raw_amounts[mint] = raw_amounts.get(mint, 0) + int.from_bytes(data[64:72], "little")
+        mints = [mint for mint, amount in raw_amounts.items() if amount > 0]
+
+        # 2) Decimales de cada mint con getMultipleAccounts (hasta 100 cuentas por llamada)
+        chunks = [mints[i:i + 100] for i in range(0, len(mints), 100)]
+        mint_accounts = await self.rpc_batch([
+            ("getMultipleAccounts", [chunk, {"encoding": "base64", "dataSlice": {"offset": 44, "length": 1}}])
+            for chunk in chunks
+        ])
+
+        balances = []
+        for chunk, result in zip(chunks, mint_accounts):
+            for mint, account in zip(chunk, (result or {}).get("value", [])):
+                if account is None:
+                    continue
+                decimals = base64.b64decode(account["data"][0])[0]
+                balances.append({"mint": mint, "amount": raw_amounts[mint] / 10 ** decimals})
+        return balances
+
+    async def get_wallet_balances(self, owner: str) -> list:
+        """Balances de una wallet [{mint, amount}] leídos de la blockchain (None si el RPC falla)"""
+        try:
+            return await self.wallet_cache.get_or_fetch(owner, lambda: self._fetch_wallet_balances(owner))
+        except Exception as e:
+            print(f"Error getting wallet balances: {str(e)}")
+            return None
+
+    def cache_stats(self) -> dict:
+        """Estadísticas de las cachés de tokens"""
+        caches = (self.metadata_cache, self.market_cache, self.price_cache,
+                  self.history_cache, self.wallet_cache)
+        return {cache.name: cache.stats() for cache in caches}
+
+    async def close(self):
+        """Liberar recursos de red y navegadores"""
+        await self.http.close()
+        await self.io_executor.run(self.browser_pool.shutdown)
+
+    def add_indicators(self, tokens: List[TokenInfo]):
+        """Añadir RSI, MACD y picos de volumen a cada token (un solo cálculo para toda la lista)"""
+        if not tokens:
+            return
+        try:
+            import numpy as np
+
+            results = self.technical.compute(
+                [token.price_history for token in tokens],
+                [token.volume_history for token in tokens]
+            )
+            for row, token in enumerate(tokens):
+                token.indicators = {
+                    name: (None if isinstance(values[row], float) and np.isnan(values[row]) else values[row].item())
+                    for name, values in results.items()
+                }
+        except Exception as e:
+            print(f"Error calculando indicadores: {str(e)}")
+
+    def analyze_tokens(self, columns) -> "BatchAnalysis":
+        """Analizar muchos tokens en una sola pasada vectorial (ver analyze_columns)"""
+        started = time.perf_counter()
+        batch = analyze_columns(columns)
+        metrics.observe("analysis_seconds", time.perf_counter() - started)
+        metrics.inc("analysis_tokens_total", len(batch))
+        return batch
+
+    @staticmethod
+    def tokens_to_columns(tokens: List[TokenInfo]) -> TokenTable:
+        """Convertir una lista de TokenInfo en columnas para analyze_tokens"""
+        return TokenTable(tokens)
+
+    def analyze_token(self, token_data: TokenInfo) -> dict:
+        """Analizar un token y dar recomendaciones"""
+        try:
+            return self.analyze_tokens(self.tokens_to_columns([token_data])).render(0)
+        except Exception as e:
+            print(f"Error analyzing token: {str(e)}")
+            return {
+                "analysis": ["❌ Error en análisis"],
+                "risk_level": "DESCONOCIDO"
+            }
+
+class BatchAnalysis:
+    """Resultado compacto de TokenAnalyzer.analyze_tokens.
+
+    Guarda una matriz de banderas (regla x token) y un código de riesgo por
+    token; el texto solo se genera al llamar a render.
+    """
+
+    RISK_LEVELS = {1: "ALTO", 0: "BAJO", -1: "DESCONOCIDO"}
+
+    def __init__(self, flags, risk, values: dict):
+        self.flags = flags
+        self.risk = risk
+        self.values = values
+
+    def __len__(self):
+        return len(self.risk)
+
+    def high_risk(self):
+        """Índices de los tokens con riesgo ALTO"""
+        import numpy as np
+        return np.flatnonzero(self.risk == 1)
+
+    def render(self, index: int) -> dict:
+        """Generar el análisis en texto de un token"""
+        risk = int(self.risk[index])
+        if risk == -1:
+            return {"analysis": ["❌ Error en análisis"], "risk_level": self.RISK_LEVELS[risk]}
+
+        values = {name: float(column[index]) for name, column in self.values.items()}
+        analysis = [
+            message.format(**values)
+            for (_, message, _), hit in zip(ANALYSIS_RULES, self.flags[:, index]) if hit
+        ]
+        return {"analysis": analysis, "risk_level": self.RISK_LEVELS[risk]}
+
+def analyze_columns(columns) -> BatchAnalysis:
+    """Analizar muchos tokens en una sola pasada vectorial.
+
+    `columns` es un TokenTable, un DataFrame o un dict de arrays con
+    price_change_24h, volume_24h, holders y created_at (y opcionalmente
+    rsi, macd_cross, volume_change y volume_spike de add_indicators).
+    """
+    import numpy as np
+
+    count = len(columns['price_change_24h'])
+
+    def column(name):
+        if name not in columns:
+            return np.full(count, np.nan)
+        return np.asarray(columns[name], dtype=float)
+
+    change = column('price_change_24h')
+    volume = column('volume_24h')
+    holders = column('holders')
+    age_days = np.floor((time.time() - column('created_at')) / 86400)
+    rsi = column('rsi')
+    macd_cross = column('macd_cross')
+    volume_change = column('volume_change')
+
+    masks = {
+        "price_up": change > 20,
+        "price_down": change < -20,
+        "low_volume": volume < 10000,
+        "high_volume": volume > 1000000,
+        "few_holders": holders < 100,
+        "many_holders": holders > 1000,
+        "new_token": age_days < 7,
+        "established": age_days > 30,
+        "rsi_overbought": rsi > TA_PARAMS['RSI_OVERBOUGHT'],
+        "rsi_oversold": rsi < TA_PARAMS['RSI_OVERSOLD'],
+        "macd_bullish": macd_cross == 1,
+        "macd_bearish": macd_cross == -1,
+        "volume_spike": column('volume_spike') == 1
+    }
+    flags = np.stack([masks[key] for key, _, _ in ANALYSIS_RULES])
+    raises_risk = np.array([risky for _, _, risky in ANALYSIS_RULES])
+
+    risk = np.where(flags[raises_risk].any(axis=0), 1, 0).astype(np.int8)
+    invalid = np.isnan(change) | np.isnan(volume) | np.isnan(holders) | np.isnan(age_days)
+    risk[invalid] = -1
+    flags[:, invalid] = False
+
+    return BatchAnalysis(flags, risk, {"rsi": rsi, "volume_change": volume_change})
+
+class SessionStore(abc.ABC):
+    """Almacén de wallets conectadas por usuario con caducidad (TTL)"""
+
+    def __init__(self, ttl: float = None):
+        self.ttl = ttl or Config.SESSION_TTL
+
+    @abc.abstractmethod
+    async def get(self, user_id: int) -> str:
+        """Wallet conectada del usuario o None"""
+
+    @abc.abstractmethod
+    async def set(self, user_id: int, wallet_address: str):
+        """Guardar (o renovar) la wallet del usuario"""
+
+    @abc.abstractmethod
+    async def delete(self, user_id: int) -> bool:
+        """Borrar la sesión; devuelve True si existía"""
+
+    async def purge_expired(self, context: ContextTypes.DEFAULT_TYPE = None):
+        """Eliminar sesiones caducadas (tarea periódica)"""
+
+class MemorySessionStore(SessionStore):
+    """Sesiones en memoria del proceso (se pierden al reiniciar)"""
+
+    def __init__(self, ttl: float = None):
+        super().__init__(ttl)
+        self._sessions = {}  # user_id -> (wallet, expira)
+        self._lock = threading.Lock()
+
+    async def get(self, user_id: int) -> str:
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is None:
+                return None
+            if session[1] < time.time():
+                del self._sessions[user_id]
+                return None
+            return session[0]
+
+    async def set(self, user_id: int, wallet_address: str):
+        with self._lock:
+            self._sessions[user_id] = (wallet_address, time.time() + self.ttl)
+
+    async def delete(self, user_id: int) -> bool:
+        with self._lock:
+            return self._sessions.pop(user_id, None) is not None
+
+    async def purge_expired(self, context: ContextTypes.DEFAULT_TYPE = None):
+        now = time.time()
+        with self._lock:
+            for user_id in [u for u, (_, expires) in self._sessions.items() if expires < now]:
+                del self._sessions[user_id]
+
+class SQLiteSessionStore(SessionStore):
+    """Sesiones persistentes en SQLite (modo WAL) compartibles entre procesos"""
+
+    def __init__(self, path: str = None, ttl: float = None, executor: "ManagedExecutor" = None):
+        super().__init__(ttl)
+        # Las consultas bloquean: van al pool de hilos acotado (cola, ExecutorBusy y métricas)
+        self.executor = executor or ManagedExecutor("io", Config.THREAD_POOL_SIZE, Config.EXECUTOR_QUEUE_SIZE)
+        self._conn = sqlite3.connect(path or Config.SESSION_DB_PATH, check_same_thread=False, timeout=5)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "user_id INTEGER PRIMARY KEY, wallet TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params)
+
+    def _fetchone(self, sql: str, params: tuple = ()):
+        """Leer la fila sin soltar el lock: el cursor comparte la conexión con otros hilos"""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    async def get(self, user_id: int) -> str:
+        row = await self.executor.run(
+            self._fetchone,
+            "SELECT wallet FROM sessions WHERE user_id = ? AND expires_at >= ?",
+            (user_id, time.time())
+        )
+        return row[0] if row else None
+
+    async def set(self, user_id: int, wallet_address: str):
+        await self.executor.run(
+            self._execute,
+            "INSERT OR REPLACE INTO sessions (user_id, wallet, expires_at) VALUES (?, ?, ?)",
+            (user_id, wallet_address, time.time() + self.ttl)
+        )
+
+    async def delete(self, user_id: int) -> bool:
+        def remove():
+            return self._execute("DELETE FROM sessions WHERE user_id = ?", (user_id,)).rowcount
+        return await self.executor.run(remove) > 0
+
+    async def purge_expired(self, context: ContextTypes.DEFAULT_TYPE = None):
+        await self.executor.run(self._execute, "DELETE FROM sessions WHERE expires_at < ?", (time.time(),))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def create_session_store(executor: "ManagedExecutor" = None) -> SessionStore:
+    """Crear el almacén de sesiones configurado en Config.SESSION_BACKEND"""
+    if Config.SESSION_BACKEND == "memory":
+        return MemorySessionStore()
+    if Config.SESSION_BACKEND == "sqlite":
+        return SQLiteSessionStore(executor=executor)
+    raise ValueError(f"SESSION_BACKEND desconocido: {Config.SESSION_BACKEND}")
+
+class PortfolioPosition:
+    """Estado de un token dentro de la valoración de una wallet"""
+
+    def __init__(self, mint: str, amount: float):
+        self.mint = mint
+        self.amount = amount
+        self.price = None
+        self.price_change = 0.0
+        self.symbol = None
+        self.value = 0.0
+        self.info_at = None  # Última vez que se obtuvo nombre y cambio 24h
+        self.error = False
+        self.block = None  # Texto renderizado; None si hay que regenerarlo
+
+    def render(self) -> str:
+        if self.error or self.price is None:
+            return PORTFOLIO_ERROR_ENTRY.format(
+                short_mint=f"{self.mint[:6]}...{self.mint[-4:]}", amount=self.amount
+            )
+        return PORTFOLIO_ENTRY.format(
+            symbol=escape_markdown(self.symbol or ""),
+            amount=self.amount,
+            price=self.price,
+            emoji="🟢" if self.price_change >= 0 else "🔴",
+            change=self.price_change,
+            value=self.value
+        )
+
+class PortfolioValuation:
+    """Valoración incremental de una wallet.
+
+    Conserva cantidades, precios y valores de la última actualización; cada
+    cambio de balance o de precio recalcula solo la posición afectada y
+    ajusta el total con la diferencia.
+    """
+
+    def __init__(self):
+        self.positions: Dict[str, PortfolioPosition] = {}
+        self.total_value = 0.0
+
+    def mints(self) -> List[str]:
+        return list(self.positions)
+
+    def _revalue(self, position: PortfolioPosition):
+        value = position.amount * position.price if position.price is not None and not position.error else 0.0
+        self.total_value += value - position.value
+        position.value = value
+        position.block = None
+
+    def apply_balances(self, balances: list) -> List[str]:
+        """Aplicar un nuevo listado de balances; devuelve los mints que cambiaron"""
+        amounts = {}
+        for token in balances:
+            if token['amount'] > 0:
+                amounts[token['mint']] = token['amount']
+
+        changed = []
+        for mint in [m for m in self.positions if m not in amounts]:
+            self.total_value -= self.positions.pop(mint).value
+            changed.append(mint)
+
+        for mint, amount in amounts.items():
+            position = self.positions.get(mint)
+            if position is None:
+                self.positions[mint] = PortfolioPosition(mint, amount)
+                changed.append(mint)
+            elif position.amount != amount:
+                position.amount = amount
+                self._revalue(position)
+                changed.append(mint)
+        return changed
+
+    def apply_prices(self, prices: Dict[str, float]) -> List[str]:
+        """Aplicar precios nuevos; devuelve los mints cuyo precio cambió"""
+        changed = []
+        for mint, price in prices.items():
+            position = self.positions.get(mint)
+            if position is not None and position.price != price:
+                position.price = price
+                self._revalue(position)
+                changed.append(mint)
+        return changed
+
+    def apply_info(self, mint: str, token_info: TokenInfo):
+        """Aplicar nombre, cambio 24h (y precio si no vino en el lote) de un token"""
+        position = self.positions.get(mint)
+        if position is None:
+            return
+        position.info_at = time.monotonic()
+        position.error = not token_info
+        if token_info:
+            position.symbol = token_info.symbol
+            position.price_change = token_info.price_change_24h
+            if position.price is None:
+                position.price = token_info.price
+        self._revalue(position)
+
+    def stale_mints(self, max_age: float) -> List[str]:
+        """Mints sin datos de token o con datos más viejos que max_age segundos"""
+        now = time.monotonic()
+        return [
+            mint for mint, position in self.positions.items()
+            if position.info_at is None or now - position.info_at > max_age
         ]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
-# Technical Analysis Parameters
-TA_PARAMS = {
-    'RSI_PERIOD': 14,
-    'RSI_OVERBOUGHT': 70,
-    'RSI_OVERSOLD': 30,
-    'MACD_FAST': 12,
-    'MACD_SLOW': 26,
-    'MACD_SIGNAL': 9,
-    'VOLUME_CHANGE_THRESHOLD': 50  # Percentage
-}
+    def render_blocks(self) -> List[str]:
+        """Bloques de texto por token; solo se regeneran los que cambiaron"""
+        blocks = []
+        for position in self.positions.values():
+            if position.block is None:
+                position.block = position.render()
+            blocks.append(position.block)
+        return blocks
+
+class PriceAlert:
+    """Suscripción de un chat: precio que cruza un umbral o cambio 24h de ±N%"""
+
+    def __init__(self, alert_id: int, chat_id: int, mint: str, kind: str, threshold: float,
+                 reference: float = None):
+        self.id = alert_id
+        self.chat_id = chat_id
+        self.mint = mint
+        self.kind = kind  # "price" o "change"
+        self.threshold = threshold
+        self.reference = reference  # Precio al crear la alerta: decide el sentido del cruce
+
+    def describe(self) -> str:
+        token = f"{self.mint[:6]}...{self.mint[-4:]}"
+        if self.kind == "price":
+            return f"#{self.id} `{token}` cruza ${self.threshold:.6g}"
+        return f"#{self.id} `{token}` se mueve ±{self.threshold:g}% en 24h"
+
+class AlertEngine:
+    """Motor de alertas de precio.
+
+    Los umbrales se guardan en listas ordenadas por mint, de modo que cada
+    precio nuevo se resuelve con búsquedas binarias en O(log n + aciertos)
+    sin recorrer todas las suscripciones. Cada alerta de precio se compara con
+    su propio precio de referencia (el de cuando se creó): las que esperan una
+    subida van a un índice y las que esperan una bajada a otro, así que una
+    alerta nueva no hereda el último precio observado por las anteriores.
+    Las alertas se disparan una vez.
+    """
 
-class TokenAnalyzer:
     def __init__(self):
-        self.setup_selenium()
-    
-    def setup_selenium(self):
-        """Configure Selenium for headless browsing"""
-        try:
-            chrome_options = Options()
-            chrome_options.add_argument("--headless=new")
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--log-level=3")
-            
-            try:
-                service = Service()
-                self.driver = webdriver.Chrome(service=service, options=chrome_options)
-            except Exception as e:
-                print(f"Error installing ChromeDriver: {str(e)}")
-                self.driver = None
-        except Exception as e:
-            print(f"Error setting up Selenium: {str(e)}")
-            self.driver = None
+        self.alerts: Dict[int, PriceAlert] = {}
+        self._next_id = 1
+        self._up_index: Dict[str, list] = {}      # mint -> [(umbral, id)] ordenado, umbral >= referencia
+        self._down_index: Dict[str, list] = {}    # mint -> [(umbral, id)] ordenado, umbral < referencia
+        self._change_index: Dict[str, list] = {}  # mint -> [(porcentaje, id)] ordenado
+        self._last_price: Dict[str, float] = {}
+        self._by_chat: Dict[int, set] = {}
 
-    def __del__(self):
-        """Cleanup Selenium driver"""
-        try:
-            if hasattr(self, 'driver'):
-                self.driver.quit()
-        except Exception:
-            pass
-    
-    async def get_token_info(self, token_address: str) -> dict:
-        """Obtener información detallada de un token usando endpoints públicos"""
-        try:
-            # Usar Jupiter API para precio y datos básicos
-            jupiter_url = f"{Config.JUPITER_API_BASE}/price?ids={token_address}"
-            response = requests.get(jupiter_url)
-            price_data = response.json()
-            
-            # Usar Raydium API para datos adicionales
-            raydium_url = f"{Config.RAYDIUM_API_BASE}/token/{token_address}"
-            raydium_response = requests.get(raydium_url)
-            token_data = raydium_response.json()
-            
-            if not price_data or not token_data:
-                return None
+    def watched_mints(self) -> List[str]:
+        """Mints con al menos una alerta activa"""
+        return list(self._up_index.keys() | self._down_index.keys() | self._change_index.keys())
 
-            # Calcular cambio de precio usando datos históricos de Raydium
-            history_url = f"{Config.RAYDIUM_API_BASE}/price-history?address={token_address}&type=1D"
-            history_response = requests.get(history_url)
-            history_data = history_response.json()
-            
-            price_change_24h = 0
-            if history_data and len(history_data) > 1:
-                old_price = history_data[0]['price']
-                new_price = history_data[-1]['price']
-                price_change_24h = ((new_price - old_price) / old_price) * 100
+    def change_mints(self) -> List[str]:
+        """Mints que necesitan el cambio de 24h"""
+        return list(self._change_index)
 
-            return {
-                "name": token_data.get('name'),
-                "symbol": token_data.get('symbol'),
-                "price": float(price_data['data'][token_address].get('price', 0)),
-                "price_change_24h": price_change_24h,
-                "volume_24h": float(token_data.get('volume24h', 0)),
-                "market_cap": float(token_data.get('marketCap', 0)),
-                "holders": token_data.get('holderCount', 0),
-                "created_at": token_data.get('createdAt', int(time.time()))
-            }
-        except Exception as e:
-            print(f"Error getting token info: {str(e)}")
+    def for_chat(self, chat_id: int) -> List[PriceAlert]:
+        return sorted((self.alerts[i] for i in self._by_chat.get(chat_id, ())), key=lambda a: a.id)
+
+    def add(self, chat_id: int, mint: str, kind: str, threshold: float,
+            reference_price: float = None) -> PriceAlert:
+        """Crear una alerta; reference_price es el precio desde el que se mide el cruce
+        (por defecto el último precio observado del mint)"""
+        if reference_price is None:
+            reference_price = self._last_price.get(mint)
+        if kind == "price" and reference_price is None:
+            raise ValueError("Una alerta de precio necesita un precio de referencia")
+        alert = PriceAlert(self._next_id, chat_id, mint, kind, threshold, reference_price)
+        self._next_id += 1
+        self.alerts[alert.id] = alert
+        self._by_chat.setdefault(chat_id, set()).add(alert.id)
+        bisect.insort(self._index(alert).setdefault(mint, []), (threshold, alert.id))
+        if reference_price is not None:
+            self._last_price[mint] = reference_price
+        return alert
+
+    def _index(self, alert: PriceAlert) -> dict:
+        if alert.kind == "change":
+            return self._change_index
+        return self._up_index if alert.threshold >= alert.reference else self._down_index
+
+    def remove(self, alert_id: int) -> PriceAlert:
+        alert = self.alerts.pop(alert_id, None)
+        if alert is None:
             return None
+        index = self._index(alert)
+        entries = index[alert.mint]
+        entries.pop(bisect.bisect_left(entries, (alert.threshold, alert.id)))
+        self._prune(index, alert.mint)
+        self._forget(alert)
+        return alert
 
-    async def get_trending_tokens(self) -> list:
-        """Obtener tokens en tendencia usando Raydium"""
-        try:
-            # Obtener pares de trading de Raydium
-            url = f"{Config.RAYDIUM_API_BASE}/pairs"
-            response = requests.get(url)
-            pairs_data = response.json()
-            
-            if not isinstance(pairs_data, list):
-                return []
+    def _prune(self, index: dict, mint: str):
+        """Quitar el mint del índice si ya no le quedan alertas"""
+        if index[mint]:
+            return
+        del index[mint]
+        if all(mint not in other for other in (self._up_index, self._down_index, self._change_index)):
+            self._last_price.pop(mint, None)
 
-            # Filtrar y ordenar por volumen
-            valid_pairs = []
-            for pair in pairs_data:
-                try:
-                    volume = float(pair.get('volume24h', 0))
-                    if volume > 0 and 'tokenInfo' in pair:
-                        valid_pairs.append({
-                            'volume': volume,
-                            'token': pair['tokenInfo']
-                        })
-                except (ValueError, TypeError):
-                    continue
+    def _forget(self, alert: PriceAlert):
+        """Quitar la alerta de la lista de su chat"""
+        chat_alerts = self._by_chat.get(alert.chat_id)
+        chat_alerts.discard(alert.id)
+        if not chat_alerts:
+            del self._by_chat[alert.chat_id]
 
-            # Ordenar por volumen y tomar los top 10
-            valid_pairs.sort(key=lambda x: x['volume'], reverse=True)
-            trending = []
+    def _fire(self, index: dict, mint: str, start: int, end: int) -> List[PriceAlert]:
+        """Extraer y devolver las alertas entries[start:end] de un mint"""
+        entries = index[mint]
+        hits = [self.alerts.pop(alert_id) for _, alert_id in entries[start:end]]
+        del entries[start:end]
+        self._prune(index, mint)
+        for alert in hits:
+            self._forget(alert)
+        return hits
 
-            for pair_data in valid_pairs[:10]:
-                token = pair_data['token']
-                token_info = await self.get_token_info(token['mint'])
-                
-                if token_info:
-                    trending.append({
-                        **token_info,
-                        "address": token['mint']
-                    })
+    def observe_price(self, mint: str, price: float) -> List[PriceAlert]:
+        """Registrar un precio; devuelve las alertas que alcanzó desde su referencia"""
+        if mint in self._last_price:
+            self._last_price[mint] = price
+        fired = []
+        up = self._up_index.get(mint)
+        if up:
+            # Alertas de subida con umbral <= precio
+            end = bisect.bisect_right(up, (price, float('inf')))
+            if end:
+                fired.extend(self._fire(self._up_index, mint, 0, end))
+        down = self._down_index.get(mint)
+        if down:
+            # Alertas de bajada con umbral >= precio
+            start = bisect.bisect_left(down, (price, -1))
+            if start < len(down):
+                fired.extend(self._fire(self._down_index, mint, start, len(down)))
+        return fired
 
-            return trending
-        except Exception as e:
-            print(f"Error getting trending tokens: {str(e)}")
+    def observe_change(self, mint: str, change_24h: float) -> List[PriceAlert]:
+        """Devuelve las alertas de ±N% cuyo umbral alcanza el cambio de 24h"""
+        entries = self._change_index.get(mint)
+        if not entries:
             return []
+        end = bisect.bisect_right(entries, (abs(change_24h), float('inf')))
+        return self._fire(self._change_index, mint, 0, end) if end else []
 
-    def analyze_token(self, token_data: dict) -> dict:
-        """Analizar un token y dar recomendaciones"""
+class TrendingSnapshot:
+    """Instantánea precalculada de tokens en tendencia con su análisis"""
+
+    def __init__(self, tokens: TokenTable, analyses: list, version: int):
+        self.tokens = tokens
+        self.analyses = analyses
+        self.version = version
+        self.created_at = time.time()
+
+    @property
+    def age(self) -> float:
+        """Segundos desde que se generó la instantánea"""
+        return time.time() - self.created_at
+
+def format_age(seconds: float) -> str:
+    """Formatear una antigüedad en segundos de forma legible"""
+    if seconds < 60:
+        return f"{int(seconds)} s"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min"
+    return f"{int(seconds // 3600)} h"
+
+def split_message(blocks: List[str], limit: int = None, separator: str = "\n") -> List[str]:
+    """Agrupar bloques de texto en mensajes de hasta `limit` caracteres.
+
+    Los bloques (una entrada por token) no se cortan para no romper el
+    Markdown; solo un bloque más largo que el límite se parte por líneas.
+    """
+    limit = limit or Config.MESSAGE_MAX_LENGTH
+    messages, current, length = [], [], 0
+    for block in blocks:
+        pieces = [block]
+        if len(block) > limit:
+            pieces, piece = [], ""
+            for line in block.split("\n"):
+                while len(line) > limit:
+                    if piece:
+                        pieces.append(piece)
+                        piece = ""
+                    pieces.append(line[:limit])
+                    line = line[limit:]
+                if piece and len(piece) + 1 + len(line) > limit:
+                    pieces.append(piece)
+                    piece = line
+                else:
+                    piece = f"{piece}\n{line}" if piece else line
+            pieces.append(piece)
+        for piece in pieces:
+            extra = len(piece) + (len(separator) if current else 0)
+            if current and length + extra > limit:
+                messages.append(separator.join(current))
+                current, length = [], 0
+                extra = len(piece)
+            current.append(piece)
+            length += extra
+    if current:
+        messages.append(separator.join(current))
+    return messages
+
+class MessageRenderer:
+    """Renderizado de mensajes con plantillas y caché LRU.
+
+    Los bloques de /trending se generan una vez por (token, versión de la
+    instantánea) y la página ya partida en mensajes una vez por versión, así
+    que cientos de usuarios pidiendo /trending comparten el mismo texto.
+    """
+
+    HEADER_RESERVE = 64  # Espacio para la cabecera que se añade en cada petición
+
+    def __init__(self, max_size: int = None):
+        self.max_size = max_size or Config.RENDER_CACHE_SIZE
+        self._cache = OrderedDict()  # (vista, clave, versión) -> texto o lista de mensajes
+        self.hits = 0
+        self.misses = 0
+
+    def _cached(self, key: tuple, render):
+        value = self._cache.get(key)
+        if value is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = render()
+        self._cache[key] = value
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return value
+
+    @staticmethod
+    def format_analysis(analysis: dict, bullet: str) -> str:
+        return "\n".join(f"{bullet}{line}" for line in analysis['analysis'])
+
+    def trending_entry(self, token: TokenInfo, analysis: dict, version: int) -> str:
+        """Bloque de un token en /trending"""
+        return self._cached(("trending", token.address, version), lambda: TRENDING_ENTRY.format(
+            symbol=escape_markdown(token.symbol or ""),
+            emoji="🟢" if token.price_change_24h >= 0 else "🔴",
+            change=token.price_change_24h,
+            price=token.price,
+            volume=token.volume_24h,
+            holders=token.holders,
+            risk=analysis['risk_level'],
+            analysis=self.format_analysis(analysis, "  • ")
+        ))
+
+    def trending(self, snapshot: TrendingSnapshot) -> List[str]:
+        """Mensajes de /trending; solo la cabecera con la antigüedad se genera por petición"""
+        pages = self._cached(("trending_page", None, snapshot.version), lambda: split_message(
+            [self.trending_entry(token, analysis, snapshot.version)
+             for token, analysis in zip(snapshot.tokens, snapshot.analyses)],
+            Config.MESSAGE_MAX_LENGTH - self.HEADER_RESERVE
+        ))
+        header = TRENDING_HEADER.format(age=format_age(snapshot.age))
+        return [header + "\n" + pages[0]] + pages[1:] if pages else [header]
+
+    def analyze(self, token: TokenInfo, analysis: dict) -> str:
+        """Mensaje de /analyze"""
+        return ANALYZE_MESSAGE.format(
+            name=escape_markdown(token.name or ""),
+            symbol=escape_markdown(token.symbol or ""),
+            price=token.price,
+            emoji="🟢" if token.price_change_24h >= 0 else "🔴",
+            change=token.price_change_24h,
+            market_cap=token.market_cap,
+            volume=token.volume_24h,
+            holders=token.holders,
+            risk=analysis['risk_level'],
+            analysis=self.format_analysis(analysis, "• ")
+        )
+
+    def portfolio(self, valuation: "PortfolioValuation") -> List[str]:
+        """Mensajes del portfolio (los bloques por token ya los cachea la valoración)"""
+        blocks = [PORTFOLIO_HEADER] + valuation.render_blocks()
+        blocks.append(PORTFOLIO_TOTAL.format(total=valuation.total_value))
+        return split_message(blocks)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+class MessageSender:
+    """Envío de mensajes a Telegram respetando los límites de flood.
+
+    Los mensajes de un mismo chat salen en orden, uno detrás de otro; los de
+    chats distintos se envían en paralelo y todos comparten un token bucket
+    global. Un RetryAfter pausa solo el chat que lo recibió y se reintenta el
+    mismo mensaje; si varios chats están pausados a la vez se trata como el
+    límite global del bot y se pausa también el bucket.
+    """
+
+    def __init__(self):
+        rate, burst = parse_rate_limit(Config.SEND_RATE_LIMIT)
+        self.scheduler = ProviderScheduler("telegram", rate, burst)
+        self._chats: Dict[int, list] = {}  # chat_id -> [lock, envíos en curso, pausado hasta]
+        self.retries = 0
+        self.plain_fallbacks = 0
+
+    @asynccontextmanager
+    async def _chat(self, chat_id: int):
+        """Serializar los envíos de un chat sin guardar un lock por chat para siempre"""
+        entry = self._chats.setdefault(chat_id, [asyncio.Lock(), 0, 0.0])
+        entry[1] += 1
         try:
-            analysis = []
-            risk_level = "BAJO"
-
-            # Análisis de precio
-            if token_data['price_change_24h'] > 20:
-                analysis.append("⚠️ Precio subió más de 20% en 24h")
-                risk_level = "ALTO"
-            elif token_data['price_change_24h'] < -20:
-                analysis.append("⚠️ Precio bajó más de 20% en 24h")
-                risk_level = "ALTO"
-
-            # Análisis de volumen
-            if token_data['volume_24h'] < 10000:
-                analysis.append("⚠️ Volumen bajo (<$10k)")
-                risk_level = "ALTO"
-            elif token_data['volume_24h'] > 1000000:
-                analysis.append("✅ Alto volumen (>$1M)")
-
-            # Análisis de holders
-            if token_data['holders'] < 100:
-                analysis.append("⚠️ Pocos holders (<100)")
-                risk_level = "ALTO"
-            elif token_data['holders'] > 1000:
-                analysis.append("✅ Buena distribución (>1000 holders)")
-
-            # Análisis de edad
-            created_at = datetime.fromtimestamp(token_data['created_at'])
-            age_days = (datetime.now() - created_at).days
-            
-            if age_days < 7:
-                analysis.append("⚠️ Token muy nuevo (<7 días)")
-                risk_level = "ALTO"
-            elif age_days > 30:
-                analysis.append("✅ Token establecido (>30 días)")
+            async with entry[0]:
+                yield entry
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chats[chat_id]
 
-            return {
-                "analysis": analysis,
-                "risk_level": risk_level
-            }
-        except Exception as e:
-            print(f"Error analyzing token: {str(e)}")
-            return {
-                "analysis": ["❌ Error en análisis"],
-                "risk_level": "DESCONOCIDO"
-            }
+    async def _send_one(self, entry: list, reply, text: str, **kwargs):
+        retries = 0
+        while True:
+            delay = entry[2] - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.scheduler.acquire()
+            try:
+                return await reply(text, **kwargs)
+            except RetryAfter as e:
+                if retries >= Config.SEND_RETRIES:
+                    raise
+                retries += 1
+                self.retries += 1
+                metrics.inc("telegram_retry_after_total")
+                now = time.monotonic()
+                entry[2] = now + float(e.retry_after)
+                if any(other is not entry and other[2] > now for other in self._chats.values()):
+                    # Más de un chat limitado a la vez: es el flood global del bot
+                    self.scheduler.penalize(float(e.retry_after))
+            except BadRequest as e:
+                # Markdown que Telegram no acepta: mejor enviarlo sin formato que perderlo
+                if not kwargs.get('parse_mode') or "parse entities" not in str(e).lower():
+                    raise
+                self.plain_fallbacks += 1
+                kwargs = {key: value for key, value in kwargs.items() if key != 'parse_mode'}
+
+    async def send(self, reply, chat_id: int, messages: List[str], **kwargs):
+        """Enviar `messages` en orden con reply(texto, **kwargs)"""
+        async with self._chat(chat_id) as entry:
+            for text in messages:
+                await self._send_one(entry, reply, text, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            **self.scheduler.stats(),
+            "retries": self.retries,
+            "plain_fallbacks": self.plain_fallbacks
+        }
 
 class PhantomBot:
     def __init__(self):
-        self.token_analyzer = TokenAnalyzer()
-        self.connected_wallets = {}  # Almacenar wallets conectadas por usuario_id
+        # Pool de hilos compartido por las sesiones SQLite y los navegadores
+        self.io_executor = ManagedExecutor("io", Config.THREAD_POOL_SIZE, Config.EXECUTOR_QUEUE_SIZE)
+        self.token_analyzer = TokenAnalyzer(self.io_executor)
+        self.sessions = create_session_store(self.io_executor)  # Wallets conectadas por usuario_id
+        self.portfolios = TTLCache("portfolio", Config.PORTFOLIO_TTL)  # PortfolioValuation por wallet
+        self.trending_snapshot = None  # Última instantánea de /trending
+        self.alerts = AlertEngine()
+        self._pending_alerts: Dict[int, List[str]] = {}  # chat_id -> avisos pendientes
+        self._last_alert_sent: Dict[int, float] = {}
+        self._trending_lock = asyncio.Lock()
+        self.renderer = MessageRenderer()
+        self.sender = MessageSender()
+        self.cpu_executor = ManagedExecutor(
+            "cpu", Config.PROCESS_POOL_SIZE, Config.EXECUTOR_QUEUE_SIZE, processes=True
+        )
+
+    async def refresh_trending(self, context: ContextTypes.DEFAULT_TYPE = None) -> TrendingSnapshot:
+        """Reconstruir la instantánea de tokens en tendencia (tarea periódica del job queue)"""
+        requested_at = time.time()
+        async with self._trending_lock:
+            current = self.trending_snapshot
+            # Otra llamada ya la reconstruyó mientras esperábamos el lock
+            if current and current.created_at >= requested_at:
+                return current
+
+            tokens = await self.token_analyzer.get_trending_tokens()
+            if not tokens:
+                return current
+
+            batch = self.token_analyzer.analyze_tokens(tokens)
+            analyses = [batch.render(i) for i in range(len(batch))]
+            version = current.version + 1 if current else 1
+            # Sustitución atómica: los lectores ven la instantánea anterior o la nueva
+            self.trending_snapshot = TrendingSnapshot(tokens, analyses, version)
+            return self.trending_snapshot
+
+    async def check_address(self, update: Update, address: str) -> bool:
+        """Responder con un error si la dirección no es base58 (antes de consultar ninguna API)"""
+        if self.token_analyzer.history_store.valid_mint(address):
+            return True
+        await update.message.reply_text("❌ Dirección inválida: debe ser una dirección base58 de Solana")
+        return False
 
     def get_main_keyboard(self):
         """Obtener teclado principal con botón de Web App"""
@@ -252,6 +2479,7 @@ class PhantomBot:
         ]
         return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+    @instrumented("start")
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Comando /start"""
         user_id = update.effective_user.id
@@ -266,8 +2494,7 @@ class PhantomBot:
         )
         
         # Limpiar datos anteriores del usuario
-        if user_id in self.connected_wallets:
-            del self.connected_wallets[user_id]
+        await self.sessions.delete(user_id)
         
         await update.message.reply_text(
             welcome_message,
@@ -275,6 +2502,7 @@ class PhantomBot:
             reply_markup=self.get_main_keyboard()
         )
 
+    @instrumented("help")
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Comando /help"""
         help_message = (
@@ -283,7 +2511,11 @@ class PhantomBot:
             "/trending - Ver tokens en tendencia\n"
             "/analyze <dirección> - Analizar un token específico\n"
             "/portfolio - Ver tu portfolio de tokens\n"
-            "/disconnect - Desconectar tu wallet\n\n"
+            "/disconnect - Desconectar tu wallet\n"
+            "/alert <dirección> <precio|N%> - Crear una alerta de precio\n"
+            "/alerts - Ver tus alertas\n"
+            "/chart <dirección> - Gráfico de precio de 24h\n"
+            "/qr [dirección] - Código QR para conectar la wallet o de una dirección\n\n"
             "🔒 *Seguridad:*\n"
             "• Nunca compartimos tus claves privadas\n"
             "• Todas las transacciones requieren tu confirmación\n"
@@ -291,43 +2523,29 @@ class PhantomBot:
         )
         await update.message.reply_text(help_message, parse_mode='Markdown')
 
+    @instrumented("trending")
     async def trending(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Comando /trending"""
-        await update.message.reply_text("🔍 Buscando tokens en tendencia...")
+        snapshot = self.trending_snapshot
+        if snapshot is None or snapshot.age > Config.TRENDING_MAX_AGE:
+            # Todavía no hay instantánea (o la tarea periódica no está corriendo)
+            await update.message.reply_text("🔍 Buscando tokens en tendencia...")
+            snapshot = await self.refresh_trending()
         
-        trending_tokens = await self.token_analyzer.get_trending_tokens()
-        
-        if not trending_tokens:
+        if not snapshot:
             await update.message.reply_text("❌ Error obteniendo tokens en tendencia")
             return
 
-        response = ["📈 *Tokens en Tendencia*\n"]
-        
-        for token in trending_tokens:
-            analysis = self.token_analyzer.analyze_token(token)
-            price_change = token['price_change_24h']
-            price_emoji = "🟢" if price_change >= 0 else "🔴"
-            
-            response.append(
-                f"\n*{token['symbol']}* ({price_emoji}{price_change:+.2f}%)\n"
-                f"💰 Precio: ${token['price']:.6f}\n"
-                f"📊 Vol 24h: ${token['volume_24h']:,.0f}\n"
-                f"👥 Holders: {token['holders']:,}\n"
-                f"⚠️ Riesgo: {analysis['risk_level']}\n"
-                f"🔍 Análisis:\n" + "\n".join(f"  • {a}" for a in analysis['analysis'])
-            )
+        render_started = time.perf_counter()
+        messages = self.renderer.trending(snapshot)
+        metrics.observe("render_seconds", time.perf_counter() - render_started, view="trending")
 
-        # Enviar en chunks si es muy largo
-        message = "\n".join(response)
-        if len(message) > 4096:
-            for i in range(0, len(message), 4096):
-                await update.message.reply_text(
-                    message[i:i+4096],
-                    parse_mode='Markdown'
-                )
-        else:
-            await update.message.reply_text(message, parse_mode='Markdown')
+        with metrics.timer("send", view="trending"):
+            await self.sender.send(
+                update.message.reply_text, update.effective_chat.id, messages, parse_mode='Markdown'
+            )
 
+    @instrumented("analyze")
     async def analyze(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Comando /analyze <dirección>"""
         if not context.args:
@@ -339,6 +2557,8 @@ class PhantomBot:
             return
 
         token_address = context.args[0]
+        if not await self.check_address(update, token_address):
+            return
         await update.message.reply_text(f"🔍 Analizando token {token_address}...")
 
         token_info = await self.token_analyzer.get_token_info(token_address)
@@ -347,35 +2567,36 @@ class PhantomBot:
             await update.message.reply_text("❌ No se encontró información del token")
             return
 
+        self.token_analyzer.add_indicators([token_info])
         analysis = self.token_analyzer.analyze_token(token_info)
-        price_change = token_info['price_change_24h']
-        price_emoji = "🟢" if price_change >= 0 else "🔴"
-
-        response = (
-            f"*{token_info['name']} ({token_info['symbol']})*\n\n"
-            f"💰 Precio: ${token_info['price']:.6f}\n"
-            f"📊 Cambio 24h: {price_emoji}{price_change:+.2f}%\n"
-            f"💎 Market Cap: ${token_info['market_cap']:,.0f}\n"
-            f"📈 Vol 24h: ${token_info['volume_24h']:,.0f}\n"
-            f"👥 Holders: {token_info['holders']:,}\n"
-            f"⚠️ Nivel de Riesgo: {analysis['risk_level']}\n\n"
-            f"🔍 *Análisis:*\n" + "\n".join(f"• {a}" for a in analysis['analysis'])
+        await self.sender.send(
+            update.message.reply_text, update.effective_chat.id,
+            [self.renderer.analyze(token_info, analysis)], parse_mode='Markdown'
         )
 
-        await update.message.reply_text(response, parse_mode='Markdown')
-
+    @instrumented("webapp_data")
     async def handle_webapp_data(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Manejar datos de la Web App"""
         try:
-            user_id = update.effective_user.id
             data = json.loads(update.message.web_app_data.data)
-            
+        except json.JSONDecodeError:
+            await update.message.reply_text("❌ Error: Datos inválidos de la Web App")
+            return
+        await self.process_webapp_action(update.effective_user.id, data, update.message.reply_text)
+
+    async def process_webapp_action(self, user_id: int, data: dict, reply):
+        """Procesar una acción de la Web App; `reply` envía mensajes al usuario.
+
+        Se usa tanto para web_app_data de Telegram como para el endpoint HTTP
+        /api/webapp-data del servidor web.
+        """
+        try:
             if data.get('action') == 'wallet_connected':
                 # Guardar dirección de wallet
                 wallet_address = data['publicKey']
-                self.connected_wallets[user_id] = wallet_address
+                await self.sessions.set(user_id, wallet_address)
                 
-                await update.message.reply_text(
+                await reply(
                     f"✅ *Wallet conectada exitosamente*\n"
                     f"Dirección: `{wallet_address[:6]}...{wallet_address[-4:]}`\n\n"
                     f"Ahora puedes:\n"
@@ -386,79 +2607,79 @@ class PhantomBot:
                 )
             
             elif data.get('action') == 'wallet_disconnected':
-                if user_id in self.connected_wallets:
-                    del self.connected_wallets[user_id]
-                    await update.message.reply_text(
+                if await self.sessions.delete(user_id):
+                    await reply(
                         "✅ Wallet desconectada exitosamente",
                         reply_markup=self.get_main_keyboard()
                     )
             
             elif data.get('action') == 'token_balances':
-                if user_id not in self.connected_wallets:
-                    await update.message.reply_text(
+                if not await self.sessions.get(user_id):
+                    await reply(
                         "❌ No hay wallet conectada. Usa el botón 'Conectar Phantom'"
                     )
                     return
 
                 tokens = data.get('tokens', [])
                 if not tokens:
-                    await update.message.reply_text(
+                    await reply(
                         "📝 No se encontraron tokens en tu wallet"
                     )
                     return
 
-                response = ["💰 *Tu Portfolio*\n"]
-                total_value = 0
-
-                for token in tokens:
-                    if token['amount'] > 0:
-                        try:
-                            token_info = await self.token_analyzer.get_token_info(token['mint'])
-                            if token_info:
-                                value = token['amount'] * token_info['price']
-                                total_value += value
-                                price_change = token_info['price_change_24h']
-                                emoji = "🟢" if price_change >= 0 else "🔴"
-                                
-                                response.append(
-                                    f"\n*{token_info['symbol']}*\n"
-                                    f"• Cantidad: {token['amount']:,.4f}\n"
-                                    f"• Precio: ${token_info['price']:.6f}\n"
-                                    f"• Cambio 24h: {emoji}{price_change:+.2f}%\n"
-                                    f"• Valor: ${value:,.2f}"
-                                )
-                        except Exception as e:
-                            print(f"Error procesando token {token['mint']}: {str(e)}")
-                            response.append(
-                                f"\n*Token {token['mint'][:6]}...{token['mint'][-4:]}*\n"
-                                f"• Cantidad: {token['amount']:,.4f}\n"
-                                f"• Error: No se pudo obtener información"
-                            )
-
-                response.append(f"\n\n💵 *Valor Total:* ${total_value:,.2f}")
-                
-                # Enviar en chunks si es necesario
-                message = "\n".join(response)
-                if len(message) > 4096:
-                    for i in range(0, len(message), 4096):
-                        await update.message.reply_text(
-                            message[i:i+4096],
-                            parse_mode='Markdown'
-                        )
-                else:
-                    await update.message.reply_text(message, parse_mode='Markdown')
+                await self.send_portfolio(reply, user_id, tokens, await self.sessions.get(user_id))
 
-        except json.JSONDecodeError:
-            await update.message.reply_text("❌ Error: Datos inválidos de la Web App")
         except Exception as e:
-            await update.message.reply_text(f"❌ Error: {str(e)}")
+            await reply(f"❌ Error: {str(e)}")
             print(f"Error completo: {str(e)}")
 
+    async def send_portfolio(self, reply, chat_id: int, tokens: list, wallet_address: str):
+        """Valorar y enviar el portfolio a partir de una lista de {mint, amount}.
+
+        La valoración de cada wallet se conserva entre llamadas: solo se piden
+        datos de los tokens nuevos (o con datos viejos) y solo se recalculan
+        las posiciones cuya cantidad o precio cambió.
+        """
+        valuation = self.portfolios.get(wallet_address)
+        if valuation is None:
+            valuation = PortfolioValuation()
+            self.portfolios.set(wallet_address, valuation)
+
+        valuation.apply_balances(tokens)
+
+        # Un solo lote de precios para toda la wallet
+        prices = await self.token_analyzer.get_prices(valuation.mints())
+        valuation.apply_prices(prices)
+
+        # Nombre y cambio 24h solo para tokens nuevos o con datos caducados
+        limit = asyncio.Semaphore(Config.TRENDING_CONCURRENCY)
+
+        async def fetch_info(mint: str):
+            async with limit:
+                return await self.token_analyzer.get_token_info(mint, prices)
+
+        stale = valuation.stale_mints(Config.MARKET_TTL)
+        infos = await asyncio.gather(*(fetch_info(mint) for mint in stale), return_exceptions=True)
+        for mint, token_info in zip(stale, infos):
+            if isinstance(token_info, Exception):
+                print(f"Error procesando token {mint}: {str(token_info)}")
+                token_info = None
+            valuation.apply_info(mint, token_info)
+
+        render_started = time.perf_counter()
+        messages = self.renderer.portfolio(valuation)
+        metrics.observe("render_seconds", time.perf_counter() - render_started, view="portfolio")
+
+        with metrics.timer("send", view="portfolio"):
+            await self.sender.send(reply, chat_id, messages, parse_mode='Markdown')
+
+    @instrumented("portfolio")
     async def portfolio(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Comando /portfolio"""
         user_id = update.effective_user.id
         
-        if user_id not in self.connected_wallets:
+        wallet_address = await self.sessions.get(user_id)
+        if not wallet_address:
             await update.message.reply_text(
                 "❌ No hay wallet conectada\n"
                 "Usa el botón '🔗 Conectar Phantom' primero",
@@ -466,26 +2687,91 @@ class PhantomBot:
             )
             return
         
-        wallet_address = self.connected_wallets[user_id]
-        
         await update.message.reply_text(
             f"🔄 Obteniendo tokens de la wallet `{wallet_address[:6]}...{wallet_address[-4:]}`\n"
             f"Por favor espera un momento...",
             parse_mode='Markdown'
         )
         
-        # Enviar mensaje para abrir la Web App y obtener tokens
-        await update.message.reply_text(
-            "Para ver tus tokens actualizados, haz clic en el botón 'Conectar Phantom'",
-            reply_markup=self.get_main_keyboard()
+        # Leer los balances directamente de la blockchain
+        tokens = await self.token_analyzer.get_wallet_balances(wallet_address)
+        if tokens is None:
+            # Si el RPC falla, pedir los balances a través de la Web App
+            await update.message.reply_text(
+                "Para ver tus tokens actualizados, haz clic en el botón 'Conectar Phantom'",
+                reply_markup=self.get_main_keyboard()
+            )
+            return
+
+        if not tokens:
+            await update.message.reply_text("📝 No se encontraron tokens en tu wallet")
+            return
+
+        await self.send_portfolio(update.message.reply_text, update.effective_chat.id, tokens, wallet_address)
+
+    async def run_job(self, update: Update, executor: ManagedExecutor, fn, *args):
+        """Ejecutar un trabajo pesado ligado a un update; None si no se pudo o ya no hace falta"""
+        try:
+            return await executor.run(fn, *args, deadline=update_deadline(update))
+        except ExecutorBusy:
+            await update.message.reply_text("⏳ El bot está muy ocupado, inténtalo de nuevo en unos segundos")
+        except JobExpired:
+            pass  # El usuario ya no espera la respuesta
+        return None
+
+    @instrumented("qr")
+    async def qr(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /qr [dirección]"""
+        if context.args:
+            address = context.args[0]
+            if not await self.check_address(update, address):
+                return
+            short = escape_markdown(f"{address[:6]}...{address[-4:]}")
+            data, caption = f"solana:{address}", f"Dirección `{short}`"
+        else:
+            # Abrir la Web App desde otro dispositivo para conectar Phantom
+            data, caption = Config.WEBAPP_URL, "Escanea para conectar tu Phantom Wallet"
+
+        png = await self.run_job(update, self.cpu_executor, render_qr_png, data)
+        if png:
+            await update.message.reply_photo(
+                InputFile(png, filename="qr.png"), caption=caption, parse_mode='Markdown'
+            )
+
+    @instrumented("chart")
+    async def chart(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /chart <dirección>"""
+        if not context.args:
+            await update.message.reply_text(
+                "❌ Por favor proporciona la dirección del token\n"
+                "Ejemplo: `/chart TokenAddress`",
+                parse_mode='Markdown'
+            )
+            return
+        if not await self.check_address(update, context.args[0]):
+            return
+
+        token_info = await self.token_analyzer.get_token_info(context.args[0])
+        if not token_info:
+            await update.message.reply_text("❌ No se encontró información del token")
+            return
+
+        title = f"{token_info.symbol} - 24h ({token_info.price_change_24h:+.2f}%)"
+        png = await self.run_job(
+            update, self.cpu_executor, render_price_chart, title, token_info.price_history.tolist()
         )
+        if png:
+            await update.message.reply_photo(
+                InputFile(png, filename="chart.png"),
+                caption=f"💰 Precio: ${token_info.price:.6f}"
+            )
 
+    @instrumented("disconnect")
     async def disconnect(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Comando /disconnect"""
         user_id = update.effective_user.id
         
-        if user_id in self.connected_wallets:
-            del self.connected_wallets[user_id]
+        if await self.sessions.delete(user_id):
             await update.message.reply_text(
                 "✅ Wallet desconectada exitosamente",
                 reply_markup=self.get_main_keyboard()
@@ -496,6 +2782,190 @@ class PhantomBot:
                 reply_markup=self.get_main_keyboard()
             )
 
+    @instrumented("alert")
+    async def alert(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /alert <dirección> <precio|N%> y /alert borrar <id>"""
+        chat_id = update.effective_chat.id
+        args = context.args or []
+
+        if len(args) == 2 and args[0].lower() == "borrar":
+            alert = self.alerts.alerts.get(int(args[1])) if args[1].isdigit() else None
+            if alert is None or alert.chat_id != chat_id:
+                await update.message.reply_text("❌ No existe esa alerta")
+                return
+            self.alerts.remove(alert.id)
+            await update.message.reply_text(f"🗑 Alerta #{alert.id} eliminada")
+            return
+
+        if len(args) != 2:
+            await update.message.reply_text(
+                "❌ Uso: `/alert <dirección> <precio>` o `/alert <dirección> <N>%`\n"
+                "Ejemplo: `/alert TokenAddress 0.25` o `/alert TokenAddress 15%`",
+                parse_mode='Markdown'
+            )
+            return
+
+        mint, target = args
+        if not await self.check_address(update, mint):
+            return
+        try:
+            kind = "change" if target.endswith("%") else "price"
+            threshold = abs(float(target.rstrip("%").lstrip("+±$")))
+        except ValueError:
+            await update.message.reply_text("❌ Umbral inválido")
+            return
+
+        if len(self.alerts.for_chat(chat_id)) >= Config.ALERT_MAX_PER_CHAT:
+            await update.message.reply_text(
+                f"❌ Máximo {Config.ALERT_MAX_PER_CHAT} alertas por chat. Borra alguna con /alert borrar <id>"
+            )
+            return
+
+        prices = await self.token_analyzer.get_prices([mint])
+        if mint not in prices:
+            await update.message.reply_text("❌ No se encontró precio para ese token")
+            return
+
+        alert = self.alerts.add(chat_id, mint, kind, threshold, reference_price=prices[mint])
+        await update.message.reply_text(
+            f"🔔 Alerta creada: {alert.describe()}\n"
+            f"Precio actual: ${prices[mint]:.6f}",
+            parse_mode='Markdown'
+        )
+
+    @instrumented("alerts")
+    async def list_alerts(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /alerts"""
+        alerts = self.alerts.for_chat(update.effective_chat.id)
+        if not alerts:
+            await update.message.reply_text("📝 No tienes alertas activas")
+            return
+        await update.message.reply_text(
+            "🔔 *Tus alertas*\n\n" + "\n".join(alert.describe() for alert in alerts),
+            parse_mode='Markdown'
+        )
+
+    async def poll_alerts(self, context: ContextTypes.DEFAULT_TYPE):
+        """Tarea periódica: un precio por mint vigilado, sin importar cuántos suscriptores tenga"""
+        mints = self.alerts.watched_mints()
+        if mints:
+            prices = await self.token_analyzer.get_prices(mints)
+            fired = []
+            for mint, price in prices.items():
+                fired.extend((alert, price, None) for alert in self.alerts.observe_price(mint, price))
+
+            change_mints = [m for m in self.alerts.change_mints() if m in prices]
+            infos = await asyncio.gather(
+                *(self.token_analyzer.get_token_info(mint, prices) for mint in change_mints)
+            )
+            for mint, token_info in zip(change_mints, infos):
+                if token_info and not token_info.partial:
+                    change = token_info.price_change_24h
+                    fired.extend((alert, prices[mint], change) for alert in self.alerts.observe_change(mint, change))
+
+            for alert, price, change in fired:
+                line = f"🔔 {alert.describe()}\nPrecio: ${price:.6f}"
+                if change is not None:
+                    line += f" ({change:+.2f}% 24h)"
+                self._pending_alerts.setdefault(alert.chat_id, []).append(line)
+
+        await self._flush_alerts(context)
+
+    async def _flush_alerts(self, context: ContextTypes.DEFAULT_TYPE):
+        """Enviar los avisos pendientes agrupados por chat respetando el intervalo por chat"""
+        now = time.monotonic()
+        ready = [
+            chat_id for chat_id in self._pending_alerts
+            if now - self._last_alert_sent.get(chat_id, 0) >= Config.ALERT_CHAT_INTERVAL
+        ]
+        limit = asyncio.Semaphore(Config.ALERT_SEND_CONCURRENCY)
+
+        async def send(chat_id: int):
+            lines = self._pending_alerts.pop(chat_id)
+            self._last_alert_sent[chat_id] = now
+            async with limit:
+                try:
+                    await self.sender.send(
+                        functools.partial(context.bot.send_message, chat_id), chat_id,
+                        split_message(lines, separator="\n\n"), parse_mode='Markdown'
+                    )
+                except Exception as e:
+                    print(f"Error enviando alerta a {chat_id}: {str(e)}")
+
+        await asyncio.gather(*(send(chat_id) for chat_id in ready))
+
+    def collect_metrics(self) -> list:
+        """Gauges de cachés, planificadores y estado del bot para Metrics"""
+        samples = []
+        for cache, stats in self.token_analyzer.cache_stats().items():
+            for field in ("size", "hits", "stale_hits", "misses", "coalesced", "evictions", "hit_ratio"):
+                samples.append((f"cache_{field}", {"cache": cache}, stats[field]))
+        http_stats = self.token_analyzer.http.stats()
+        for provider, stats in http_stats["providers"].items():
+            for field in ("queue_depth", "requests", "throttled", "queue_wait_avg", "queue_wait_max"):
+                samples.append((f"provider_{field}", {"provider": provider}, stats[field]))
+        samples.append(("upstream_deduplicated", {}, http_stats["deduplicated"]))
+        for executor in (self.cpu_executor, self.io_executor):
+            for field in ("pending", "completed", "rejected", "expired"):
+                samples.append((f"executor_{field}", {"executor": executor.name}, executor.stats()[field]))
+        samples.append(("history_tracked_mints", {}, len(self.token_analyzer.history_store.tracked)))
+        for field, value in self.renderer.stats().items():
+            samples.append((f"render_cache_{field}", {}, value))
+        sender_stats = self.sender.stats()
+        for field in ("queue_depth", "retries", "plain_fallbacks"):
+            samples.append((f"telegram_send_{field}", {}, sender_stats[field]))
+        samples.append(("alerts_active", {}, len(self.alerts.alerts)))
+        if self.trending_snapshot:
+            samples.append(("trending_snapshot_age_seconds", {}, self.trending_snapshot.age))
+        return samples
+
+    @instrumented("stats")
+    async def stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /stats (solo administradores)"""
+        if update.effective_user.id not in Config.ADMIN_IDS:
+            await update.message.reply_text("❌ Comando solo para administradores")
+            return
+
+        def latency_lines(prefix: str, label: str) -> list:
+            lines = []
+            for (name, labels), histogram in sorted(metrics.histograms.items()):
+                if name != f"{prefix}_seconds":
+                    continue
+                value = dict(labels).get(label, "-")
+                errors = metrics.counters.get((f"{prefix}_errors_total", labels), 0)
+                lines.append(
+                    f"• {value}: {histogram.count} | p50 {histogram.quantile(0.5) * 1000:.0f}ms "
+                    f"| p99 {histogram.quantile(0.99) * 1000:.0f}ms | errores {errors / histogram.count:.1%}"
+                )
+            return lines or ["• sin datos"]
+
+        cache_stats = {**self.token_analyzer.cache_stats(), "render": self.renderer.stats()}
+        cache_lines = [
+            f"• {name}: {stats['hit_ratio']:.0%} aciertos ({stats['size']} entradas)"
+            for name, stats in cache_stats.items()
+        ]
+        provider_lines = [
+            f"• {host}: cola {stats['queue_depth']} | espera media {stats['queue_wait_avg'] * 1000:.0f}ms | 429 {stats['throttled']}"
+            for host, stats in self.token_analyzer.http.stats()["providers"].items()
+        ] or ["• sin datos"]
+        executor_lines = [
+            f"• {stats['name']}: en curso/cola {stats['pending']} | hechos {stats['completed']} "
+            f"| rechazados {stats['rejected']} | caducados {stats['expired']}"
+            for stats in (self.cpu_executor.stats(), self.io_executor.stats())
+        ]
+        lag = metrics.histograms.get(("event_loop_lag_seconds", ()))
+
+        message = "\n".join(
+            ["📊 Estadísticas", "", "Handlers:"] + latency_lines("handler", "handler")
+            + ["", "Fuentes:"] + latency_lines("source", "source")
+            + ["", "Proveedores:"] + provider_lines
+            + ["", "Cachés:"] + cache_lines
+            + ["", "Ejecutores:"] + executor_lines
+            + ["", f"Lag del event loop p99: {lag.quantile(0.99) * 1000:.0f}ms" if lag else "Lag del event loop: sin datos"]
+        )
+        await update.message.reply_text(message)
+
+    @instrumented("message")
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Manejar mensajes de texto"""
         text = update.message.text
@@ -507,10 +2977,208 @@ class PhantomBot:
         elif text == "🔗 Conectar Phantom":
             await self.start(update, context)
 
+def verify_webapp_init_data(init_data: str) -> dict:
+    """Validar el initData firmado por Telegram y devolver el usuario (o None)"""
+    params = dict(parse_qsl(init_data or "", keep_blank_values=True))
+    received_hash = params.pop("hash", None)
+    if not received_hash or not Config.TELEGRAM_TOKEN:
+        return None
+
+    data_check_string = "\n".join(f"{key}={value}" for key, value in sorted(params.items()))
+    secret_key = hmac.new(b"WebAppData", Config.TELEGRAM_TOKEN.encode(), hashlib.sha256).digest()
+    expected_hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected_hash, received_hash):
+        return None
+
+    if time.time() - float(params.get("auth_date", 0)) > Config.WEBAPP_AUTH_MAX_AGE:
+        return None
+    try:
+        return json.loads(params.get("user", ""))
+    except ValueError:
+        return None
+
+def token_summary(token: TokenInfo) -> dict:
+    """Campos de un token que se exponen en la API JSON"""
+    return token.to_dict()
+
+def build_web_app(bot: PhantomBot, application: Application, webhook: bool = None):
+    """Crear la aplicación aiohttp: webhook de Telegram y endpoints de la Web App.
+
+    No abre ningún puerto, de modo que se puede probar con el cliente de
+    pruebas de aiohttp simulando las peticiones de Telegram contra localhost.
+    La ruta del webhook solo se registra en modo webhook (o con webhook=True).
+    """
+    from aiohttp import web
+
+    @web.middleware
+    async def cors(request, handler):
+        # La Web App se sirve desde otro dominio (GitHub Pages)
+        if request.method == "OPTIONS":
+            response = web.Response()
+        else:
+            response = await handler(request)
+        if request.path.startswith("/api/"):
+            response.headers["Access-Control-Allow-Origin"] = "*"
+            response.headers["Access-Control-Allow-Headers"] = "Content-Type"
+            response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+        return response
+
+    async def telegram_webhook(request):
+        # Sin secreto configurado cualquiera podría enviar updates falsos: se rechaza todo
+        received = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not Config.WEBHOOK_SECRET or not hmac.compare_digest(received.encode(), Config.WEBHOOK_SECRET.encode()):
+            return web.Response(status=403)
+        try:
+            body = await request.json()
+            # JSON válido pero que no es un update (lista, número, objeto sin update_id...)
+            update = Update.de_json(body, application.bot) if isinstance(body, dict) else None
+        except (ValueError, TypeError, AttributeError):
+            return web.Response(status=400)
+        if update is None:
+            return web.Response(status=400)
+        await application.update_queue.put(update)
+        return web.Response()
+
+    async def health(request):
+        return web.json_response({"status": "ok"})
+
+    async def prometheus(request):
+        # El servidor es público (webhook, Web App): las métricas solo con el token
+        expected = f"Bearer {Config.METRICS_TOKEN}"
+        received = request.headers.get("Authorization", "")
+        if not Config.METRICS_TOKEN or not hmac.compare_digest(received.encode(), expected.encode()):
+            return web.Response(status=403)
+        return web.Response(text=metrics.render_prometheus(), content_type="text/plain")
+
+    async def webapp_index(request):
+        return web.FileResponse(os.path.join(os.path.dirname(os.path.abspath(__file__)), "index.html"))
+
+    async def api_trending(request):
+        snapshot = bot.trending_snapshot
+        if snapshot is None:
+            return web.json_response({"error": "Instantánea no disponible todavía"}, status=503)
+        return web.json_response({
+            "version": snapshot.version,
+            "age": snapshot.age,
+            "tokens": [
+                {**token_summary(token), **analysis}
+                for token, analysis in zip(snapshot.tokens, snapshot.analyses)
+            ]
+        })
+
+    async def api_token(request):
+        mint = request.match_info["mint"]
+        if not bot.token_analyzer.history_store.valid_mint(mint):
+            return web.json_response({"error": "Dirección inválida"}, status=400)
+        token_info = await bot.token_analyzer.get_token_info(mint)
+        if not token_info:
+            return web.json_response({"error": "Token no encontrado"}, status=404)
+        bot.token_analyzer.add_indicators([token_info])
+        return web.json_response({
+            **token_summary(token_info),
+            **bot.token_analyzer.analyze_token(token_info)
+        })
+
+    async def api_webapp_data(request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({"error": "JSON inválido"}, status=400)
+        if not isinstance(body, dict) or not isinstance(body.get("data") or {}, dict):
+            return web.json_response({"error": "Se esperaba un objeto JSON"}, status=400)
+        user = verify_webapp_init_data(body.get("initData"))
+        if not isinstance(user, dict) or "id" not in user:
+            return web.json_response({"error": "initData inválido"}, status=401)
+
+        reply = functools.partial(application.bot.send_message, user["id"])
+        await bot.process_webapp_action(user["id"], body.get("data") or {}, reply)
+        return web.json_response({"ok": True})
+
+    web_app = web.Application(middlewares=[cors])
+    if webhook if webhook is not None else Config.BOT_MODE == "webhook":
+        web_app.router.add_post(Config.WEBHOOK_PATH, telegram_webhook)
+    web_app.router.add_get("/healthz", health)
+    web_app.router.add_get("/metrics", prometheus)
+    web_app.router.add_get("/", webapp_index)
+    web_app.router.add_get("/api/trending", api_trending)
+    web_app.router.add_get("/api/token/{mint}", api_token)
+    web_app.router.add_post("/api/webapp-data", api_webapp_data)
+    return web_app
+
+async def start_web_server(bot: PhantomBot, application: Application):
+    """Levantar el servidor web local; devuelve el runner para poder pararlo"""
+    from aiohttp import web
+
+    runner = web.AppRunner(build_web_app(bot, application))
+    await runner.setup()
+    await web.TCPSite(runner, Config.WEB_HOST, Config.WEB_PORT).start()
+    print(f"Servidor web escuchando en {Config.WEB_HOST}:{Config.WEB_PORT}")
+    return runner
+
+async def run_webhook(bot: PhantomBot, application: Application):
+    """Ejecutar el bot recibiendo updates por webhook en lugar de long polling"""
+    if not Config.WEBHOOK_URL:
+        raise ValueError("WEBHOOK_URL es obligatorio en modo webhook")
+    if not Config.WEBHOOK_SECRET:
+        raise ValueError("WEBHOOK_SECRET es obligatorio en modo webhook")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Windows
+
+    async with application:
+        if application.post_init:
+            await application.post_init(application)
+        await application.bot.set_webhook(
+            url=Config.WEBHOOK_URL.rstrip("/") + Config.WEBHOOK_PATH,
+            allowed_updates=ALLOWED_UPDATES,
+            secret_token=Config.WEBHOOK_SECRET
+        )
+        await application.start()
+        runner = await start_web_server(bot, application)
+        print("Bot iniciado (webhook)...")
+        try:
+            await stop.wait()
+        finally:
+            await runner.cleanup()
+            await application.stop()
+            if application.post_shutdown:
+                await application.post_shutdown(application)
+
 def main():
     """Función principal"""
     bot = PhantomBot()
-    app = Application.builder().token(Config.TELEGRAM_TOKEN).build()
+    metrics.add_collector(bot.collect_metrics)
+    web_runner = None
+    lag_monitor = None
+
+    async def post_init(application: Application):
+        nonlocal web_runner, lag_monitor
+        lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+        # En modo polling el servidor web (Web App, métricas) es opcional
+        if Config.BOT_MODE == "polling" and Config.WEB_SERVER_ENABLED:
+            web_runner = await start_web_server(bot, application)
+
+    async def post_shutdown(application: Application):
+        if lag_monitor:
+            lag_monitor.cancel()
+        if web_runner:
+            await web_runner.cleanup()
+        await bot.token_analyzer.close()
+        bot.cpu_executor.shutdown()
+        bot.io_executor.shutdown()
+
+    app = (
+        Application.builder()
+        .token(Config.TELEGRAM_TOKEN)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Comandos
     app.add_handler(CommandHandler("start", bot.start))
@@ -519,14 +3187,57 @@ def main():
     app.add_handler(CommandHandler("analyze", bot.analyze))
     app.add_handler(CommandHandler("portfolio", bot.portfolio))
     app.add_handler(CommandHandler("disconnect", bot.disconnect))
+    app.add_handler(CommandHandler("alert", bot.alert))
+    app.add_handler(CommandHandler("alerts", bot.list_alerts))
+    app.add_handler(CommandHandler("stats", bot.stats))
+    app.add_handler(CommandHandler("qr", bot.qr))
+    app.add_handler(CommandHandler("chart", bot.chart))
 
     # Mensajes
     app.add_handler(MessageHandler(filters.StatusUpdate.WEB_APP_DATA, bot.handle_webapp_data))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_message))
 
+    # Tareas periódicas
+    if app.job_queue:
+        app.job_queue.run_repeating(
+            background_job(bot.refresh_trending),
+            interval=Config.TRENDING_REFRESH_INTERVAL,
+            first=1,
+            name="trending_snapshot"
+        )
+        app.job_queue.run_repeating(
+            background_job(bot.poll_alerts),
+            interval=Config.ALERT_POLL_INTERVAL,
+            first=Config.ALERT_POLL_INTERVAL,
+            name="price_alerts"
+        )
+        app.job_queue.run_repeating(
+            background_job(bot.token_analyzer.collect_history),
+            interval=Config.HISTORY_COLLECT_INTERVAL,
+            first=Config.HISTORY_COLLECT_INTERVAL,
+            name="price_history"
+        )
+        app.job_queue.run_repeating(
+            bot.sessions.purge_expired,
+            interval=3600,
+            first=60,
+            name="session_purge"
+        )
+        app.job_queue.run_repeating(
+            bot.token_analyzer.browser_pool.reap_idle,
+            interval=Config.BROWSER_IDLE_TIMEOUT,
+            first=Config.BROWSER_IDLE_TIMEOUT,
+            name="browser_reaper"
+        )
+    else:
+        print("JobQueue no disponible: /trending se calculará bajo demanda")
+
     # Iniciar bot
-    print("Bot iniciado...")
-    app.run_polling(allowed_updates=Update.ALL_TYPES)
+    if Config.BOT_MODE == "webhook":
+        asyncio.run(run_webhook(bot, app))
+    else:
+        print("Bot iniciado...")
+        app.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
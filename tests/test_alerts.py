@@ -0,0 +1,73 @@
+import pytest
+
+from phantom_bot import AlertEngine
+
+
+def test_several_price_alerts_on_one_mint_fire_together():
+    engine = AlertEngine()
+    first = engine.add(1, "M", "price", 1.5, reference_price=1.0)
+    second = engine.add(1, "M", "price", 1.6)
+
+    fired = engine.observe_price("M", 2.0)
+
+    assert [a.id for a in fired] == [first.id, second.id]
+    assert engine.alerts == {}
+    assert engine.for_chat(1) == []
+    assert engine.watched_mints() == []
+
+
+def test_several_change_alerts_on_one_mint_fire_together():
+    engine = AlertEngine()
+    engine.add(1, "M", "change", 5)
+    engine.add(2, "M", "change", 10)
+    kept = engine.add(2, "M", "change", 50)
+
+    fired = engine.observe_change("M", -12.0)
+
+    assert sorted(a.chat_id for a in fired) == [1, 2]
+    assert engine.for_chat(1) == []
+    assert engine.for_chat(2) == [kept]
+    assert engine.change_mints() == ["M"]
+
+
+def test_price_alerts_fire_only_when_crossed():
+    engine = AlertEngine()
+    up = engine.add(1, "M", "price", 2.0, reference_price=1.0)
+    down = engine.add(1, "M", "price", 0.5)
+
+    assert engine.observe_price("M", 1.5) == []
+    assert engine.observe_price("M", 2.0) == [up]
+    assert engine.observe_price("M", 0.4) == [down]
+    assert engine.watched_mints() == []
+
+
+def test_remove_last_alert_clears_indexes():
+    engine = AlertEngine()
+    alert = engine.add(1, "M", "price", 2.0, reference_price=1.0)
+
+    assert engine.remove(alert.id) is alert
+    assert engine.remove(alert.id) is None
+    assert engine.for_chat(1) == []
+    assert engine.observe_price("M", 3.0) == []
+
+
+def test_new_alert_is_measured_from_its_own_reference_price():
+    engine = AlertEngine()
+    existing = engine.add(1, "M", "price", 2.0, reference_price=0.9)
+    assert engine.observe_price("M", 1.0) == []
+
+    # El precio ya subió a 1.3 cuando otro usuario crea una alerta a 1.2
+    new = engine.add(2, "M", "price", 1.2, reference_price=1.3)
+
+    assert engine.observe_price("M", 1.3) == []
+    assert engine.observe_price("M", 1.1) == [new]
+    assert engine.observe_price("M", 2.5) == [existing]
+    assert engine.watched_mints() == []
+
+
+def test_price_alert_without_reference_is_rejected():
+    engine = AlertEngine()
+
+    with pytest.raises(ValueError):
+        engine.add(1, "M", "price", 1.0)
+    assert engine.alerts == {}
@@ -0,0 +1,134 @@
+import math
+import random
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from phantom_bot import TA_PARAMS, TokenAnalyzer, TokenInfo, TokenTable, analyze_columns
+
+ERROR = {"analysis": ["❌ Error en análisis"], "risk_level": "DESCONOCIDO"}
+
+
+def reference_analysis(token: dict) -> dict:
+    """analyze_token tal como era antes del análisis por columnas (una regla tras otra)"""
+    try:
+        analysis = []
+        risk_level = "BAJO"
+        if token['price_change_24h'] > 20:
+            analysis.append("⚠️ Precio subió más de 20% en 24h")
+            risk_level = "ALTO"
+        elif token['price_change_24h'] < -20:
+            analysis.append("⚠️ Precio bajó más de 20% en 24h")
+            risk_level = "ALTO"
+        if token['volume_24h'] < 10000:
+            analysis.append("⚠️ Volumen bajo (<$10k)")
+            risk_level = "ALTO"
+        elif token['volume_24h'] > 1000000:
+            analysis.append("✅ Alto volumen (>$1M)")
+        if token['holders'] < 100:
+            analysis.append("⚠️ Pocos holders (<100)")
+            risk_level = "ALTO"
+        elif token['holders'] > 1000:
+            analysis.append("✅ Buena distribución (>1000 holders)")
+        age_days = (datetime.now() - datetime.fromtimestamp(token['created_at'])).days
+        if age_days < 7:
+            analysis.append("⚠️ Token muy nuevo (<7 días)")
+            risk_level = "ALTO"
+        elif age_days > 30:
+            analysis.append("✅ Token establecido (>30 días)")
+        indicators = token.get('indicators') or {}
+        rsi = indicators.get('rsi')
+        if rsi is not None and rsi > TA_PARAMS['RSI_OVERBOUGHT']:
+            analysis.append(f"⚠️ RSI en sobrecompra ({rsi:.0f})")
+            risk_level = "ALTO"
+        elif rsi is not None and rsi < TA_PARAMS['RSI_OVERSOLD']:
+            analysis.append(f"⚠️ RSI en sobreventa ({rsi:.0f})")
+            risk_level = "ALTO"
+        if indicators.get('macd_cross') == 1:
+            analysis.append("✅ Cruce alcista del MACD")
+        elif indicators.get('macd_cross') == -1:
+            analysis.append("⚠️ Cruce bajista del MACD")
+        if indicators.get('volume_spike'):
+            analysis.append(f"⚠️ Pico de volumen ({indicators['volume_change']:+.0f}%)")
+            risk_level = "ALTO"
+        return {"analysis": analysis, "risk_level": risk_level}
+    except Exception:
+        return ERROR
+
+
+def random_tokens(count: int, seed: int = 2000) -> list:
+    rng = random.Random(seed)
+    now = time.time()
+    tokens = []
+    for i in range(count):
+        indicators = None
+        if rng.random() > 0.3:
+            indicators = {
+                "rsi": rng.uniform(0, 100),
+                "macd_cross": rng.choice([-1, 0, 1]),
+                "volume_change": rng.uniform(-100, 500),
+                "volume_spike": rng.random() < 0.2
+            }
+        tokens.append({
+            "address": f"mint-{i}",
+            "price_change_24h": rng.uniform(-50, 50),
+            "volume_24h": 10 ** rng.uniform(2, 8),
+            "holders": rng.randint(0, 5000),
+            # Medio día de margen para no caer justo en el cambio de día
+            "created_at": int(now - (rng.randint(0, 60) + 0.5) * 86400),
+            "indicators": indicators
+        })
+    return tokens
+
+
+def as_columns(tokens: list) -> dict:
+    def indicator(token, name):
+        value = (token["indicators"] or {}).get(name)
+        return math.nan if value is None else float(value)
+
+    columns = {name: np.array([token[name] for token in tokens], dtype=float)
+               for name in ("price_change_24h", "volume_24h", "holders", "created_at")}
+    for name in ("rsi", "macd_cross", "volume_change", "volume_spike"):
+        columns[name] = np.array([indicator(token, name) for token in tokens])
+    return columns
+
+
+def as_table(tokens: list) -> TokenTable:
+    return TokenTable([
+        TokenInfo(token["address"], price_change_24h=token["price_change_24h"], volume_24h=token["volume_24h"],
+                  holders=token["holders"], created_at=token["created_at"], indicators=token["indicators"])
+        for token in tokens
+    ])
+
+
+@pytest.mark.parametrize("convert", [as_columns, lambda tokens: pd.DataFrame(as_columns(tokens)), as_table],
+                         ids=["dict", "dataframe", "token_table"])
+def test_batch_matches_rule_by_rule_analysis(convert):
+    tokens = random_tokens(2000)
+
+    batch = analyze_columns(convert(tokens))
+
+    assert [batch.render(i) for i in range(len(batch))] == [reference_analysis(token) for token in tokens]
+
+
+def test_missing_values_are_unknown_risk():
+    tokens = random_tokens(4)
+    columns = as_columns(tokens)
+    columns["price_change_24h"][1] = math.nan
+    columns["volume_24h"][2] = math.nan
+
+    batch = analyze_columns(columns)
+
+    assert [batch.render(i) for i in (1, 2)] == [ERROR, ERROR]
+    assert batch.render(0) == reference_analysis(tokens[0])
+    assert batch.render(3) == reference_analysis(tokens[3])
+    assert list(batch.high_risk()) == [i for i in (0, 3) if reference_analysis(tokens[i])["risk_level"] == "ALTO"]
+
+
+def test_analyze_token_with_missing_change_is_unknown():
+    token = TokenInfo("mint", price_change_24h=None, volume_24h=5e6, holders=2000, created_at=int(time.time()))
+
+    assert TokenAnalyzer().analyze_token(token) == ERROR
@@ -0,0 +1,137 @@
+import asyncio
+
+import phantom_bot
+from phantom_bot import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, TTLCache, request_priority
+
+
+def test_interactive_miss_does_not_wait_for_background_fetch():
+    async def run():
+        cache = TTLCache("test", ttl=60)
+        release = asyncio.Event()
+
+        async def slow_fetch():
+            await release.wait()
+            return "background"
+
+        async def fast_fetch():
+            return "interactive"
+
+        async def background():
+            request_priority.set(PRIORITY_BACKGROUND)
+            return await cache.get_or_fetch("k", slow_fetch)
+
+        job = asyncio.ensure_future(background())
+        await asyncio.sleep(0)
+        assert await asyncio.wait_for(cache.get_or_fetch("k", fast_fetch), 1) == "interactive"
+        release.set()
+        assert await job == "background"
+        assert cache.misses == 2 and cache.coalesced == 0
+    asyncio.run(run())
+
+
+def test_background_miss_joins_interactive_fetch():
+    async def run():
+        cache = TTLCache("test", ttl=60)
+        calls = []
+
+        async def fetch():
+            calls.append(request_priority.get())
+            await asyncio.sleep(0.01)
+            return "value"
+
+        async def background():
+            request_priority.set(PRIORITY_BACKGROUND)
+            return await cache.get_or_fetch("k", fetch)
+
+        results = await asyncio.gather(cache.get_or_fetch("k", fetch), background())
+        assert results == ["value", "value"]
+        assert calls == [0]
+        assert cache.coalesced == 1
+    asyncio.run(run())
+
+
+def test_concurrent_misses_share_one_fetch():
+    async def run():
+        cache = TTLCache("test", ttl=60)
+        batches = []
+
+        async def fetch_many(keys):
+            batches.append(list(keys))
+            await asyncio.sleep(0.01)
+            return {key: key.upper() for key in keys}
+
+        results = await asyncio.gather(
+            cache.get_many_or_fetch(["a", "b"], fetch_many),
+            cache.get_many_or_fetch(["b", "c"], fetch_many),
+            cache.get_many_or_fetch(["a"], fetch_many)
+        )
+
+        assert results == [{"a": "A", "b": "B"}, {"b": "B", "c": "C"}, {"a": "A"}]
+        assert batches == [["a", "b"], ["c"]]
+        assert (cache.misses, cache.coalesced) == (3, 2)
+        assert await cache.get_many_or_fetch(["a", "c"], fetch_many) == {"a": "A", "c": "C"}
+        assert cache.hits == 2 and len(batches) == 2
+    asyncio.run(run())
+
+
+def test_stale_entry_is_served_while_refreshing(monkeypatch):
+    monkeypatch.setattr(phantom_bot.Config, "CACHE_STALE_FACTOR", 4)
+
+    async def run():
+        cache = TTLCache("test", ttl=0.05)
+        versions = iter(["v1", "v2"])
+        refreshed = asyncio.Event()
+        priorities = []
+
+        async def fetch():
+            priorities.append(request_priority.get())
+            if priorities[1:]:
+                refreshed.set()
+            return next(versions)
+
+        assert await cache.get_or_fetch("k", fetch) == "v1"
+        await asyncio.sleep(0.08)  # Caducada pero dentro de la ventana stale (0.05 + 0.2)
+
+        assert await cache.get_or_fetch("k", fetch) == "v1"
+        assert cache.stale_hits == 1
+        await asyncio.wait_for(refreshed.wait(), 1)
+        await asyncio.sleep(0)
+        assert cache.get("k") == "v2"
+        assert priorities == [PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND]
+
+        await asyncio.sleep(0.3)  # Fuera también de la ventana stale: ya no se sirve
+        assert cache.get("k", allow_stale=True) is None
+    asyncio.run(run())
+
+
+def test_lru_eviction_keeps_recently_used_entries():
+    cache = TTLCache("test", ttl=60, max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" pasa a ser la más reciente
+
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.evictions == 1
+
+
+def test_failed_fetch_returns_none_and_is_not_cached(capsys):
+    async def run():
+        cache = TTLCache("test", ttl=60)
+        attempts = []
+
+        async def failing():
+            attempts.append(1)
+            raise RuntimeError("upstream caído")
+
+        async def working():
+            return "ok"
+
+        assert await asyncio.gather(cache.get_or_fetch("k", failing), cache.get_or_fetch("k", failing)) == [None, None]
+        assert len(attempts) == 1
+        assert cache.get("k", allow_stale=True) is None
+        assert await cache.get_or_fetch("k", working) == "ok"
+    asyncio.run(run())
+    assert "upstream caído" in capsys.readouterr().out
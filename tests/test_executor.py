@@ -0,0 +1,51 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from phantom_bot import ExecutorBusy, JobExpired, ManagedExecutor, SQLiteSessionStore
+
+
+def test_full_queue_rejects_and_expired_jobs_do_not_run():
+    async def run():
+        executor = ManagedExecutor("io", workers=1, queue_size=1)
+        release = threading.Event()
+        ran = []
+        try:
+            blocking = asyncio.ensure_future(executor.run(release.wait))
+            await asyncio.sleep(0.01)
+            queued = asyncio.ensure_future(executor.run(ran.append, "late", deadline=time.time() + 0.05))
+            await asyncio.sleep(0.01)
+
+            with pytest.raises(ExecutorBusy):
+                await executor.run(ran.append, "rejected")
+            with pytest.raises(JobExpired):
+                await queued
+            release.set()
+            assert await blocking is True
+        finally:
+            release.set()
+            executor.shutdown()
+
+        assert ran == []
+        assert executor.stats() | {"name": None} == {
+            "name": None, "workers": 1, "pending": 0, "completed": 1, "rejected": 1, "expired": 1
+        }
+    asyncio.run(run())
+
+
+def test_sqlite_sessions_run_on_the_io_executor(tmp_path):
+    async def run():
+        executor = ManagedExecutor("io", workers=2, queue_size=4)
+        store = SQLiteSessionStore(str(tmp_path / "sessions.db"), executor=executor)
+        try:
+            await store.set(1, "wallet")
+            assert await store.get(1) == "wallet"
+            assert await store.delete(1) is True
+            await store.purge_expired()
+        finally:
+            store.close()
+            executor.shutdown()
+        assert executor.completed == 4
+    asyncio.run(run())
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+import phantom_bot
+from phantom_bot import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, HttpClient, ProviderScheduler, request_priority
+
+URL = "http://upstream.test/pairs"
+BASE = "http://upstream.test"
+
+
+def run_http(monkeypatch, handler, scenario, rate_limit: str = "20/1"):
+    """Ejecutar `scenario(http)` con un HttpClient cuyo transporte es `handler`"""
+    monkeypatch.setattr(phantom_bot.Config, "PROVIDER_RATE_LIMITS", "")
+    monkeypatch.setattr(phantom_bot.Config, "PROVIDER_DEFAULT_RATE_LIMIT", rate_limit)
+
+    async def run():
+        http = HttpClient()
+        http._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await scenario(http)
+        finally:
+            await http.close()
+    return asyncio.run(run())
+
+
+def stream_chunks(body: str, size: int) -> list:
+    """Descargar `body` con stream_json_array recibiéndolo en bloques de `size` bytes"""
+    async def content():
+        data = body.encode()
+        for start in range(0, len(data), size):
+            yield data[start:start + size]
+
+    async def run():
+        http = HttpClient()
+        http._client = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, content=content()))
+        )
+        try:
+            return [item async for item in http.stream_json_array(URL)]
+        finally:
+            await http.close()
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 64])
+def test_scalars_split_across_chunks(size):
+    body = '[12345, 678, -1.5e3, true, null, "9 0", 4]'
+
+    assert stream_chunks(body, size) == json.loads(body)
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+def test_objects_split_across_chunks(size):
+    items = [{"name": f"TK{i}-USDC", "liquidity": i * 1.5, "tokenInfo": {"decimals": 6}} for i in range(20)]
+
+    assert stream_chunks(json.dumps(items), size) == items
+
+
+def test_truncated_array_raises():
+    with pytest.raises(ValueError):
+        stream_chunks("[1, 2, 3", 3)
+
+
+def test_interactive_caller_promotes_shared_background_get(monkeypatch):
+    sent = []
+
+    def handler(request):
+        sent.append(request.url.path)
+        return httpx.Response(200, json={"path": request.url.path})
+
+    async def scenario(http):
+        await http.get_json(f"{BASE}/warmup")  # Consume la ráfaga: lo demás hace cola
+
+        async def background():
+            request_priority.set(PRIORITY_BACKGROUND)
+            return await http.get_json(f"{BASE}/x")
+
+        queued = [asyncio.ensure_future(background())]
+        await asyncio.sleep(0.01)
+        queued += [asyncio.ensure_future(http.get_json(f"{BASE}/y{i}")) for i in range(4)]
+        await asyncio.sleep(0.01)
+        joined = await http.get_json(f"{BASE}/x")
+        await asyncio.gather(*queued)
+        return joined
+
+    assert run_http(monkeypatch, handler, scenario) == {"path": "/x"}
+    assert sent == ["/warmup", "/x", "/y0", "/y1", "/y2", "/y3"]
+
+
+def test_stream_retries_throttling_and_records_metrics(monkeypatch):
+    monkeypatch.setattr(phantom_bot.Config, "HTTP_BACKOFF", 0.001)
+    monkeypatch.setattr(phantom_bot, "metrics", phantom_bot.Metrics())
+    statuses = [429, 503, 200]
+
+    def handler(request):
+        status = statuses.pop(0)
+        headers = {"Retry-After": "0"} if status == 429 else {}
+        return httpx.Response(status, headers=headers, content=b"[1, 2]" if status == 200 else b"")
+
+    async def scenario(http):
+        items = [item async for item in http.stream_json_array(URL)]
+        return items, http.scheduler(URL).throttled, http._host_limit(URL)._value
+
+    items, throttled, free_slots = run_http(monkeypatch, handler, scenario, rate_limit="1000/1000")
+
+    assert items == [1, 2]
+    assert throttled == 1
+    assert free_slots == phantom_bot.Config.HTTP_PER_HOST_LIMIT
+    counters = phantom_bot.metrics.counters
+    for status in (429, 503, 200):
+        key = ("upstream_requests_total", (("provider", "upstream.test"), ("status", status)))
+        assert counters[key] == 1
+    assert phantom_bot.metrics.histograms[("upstream_seconds", (("provider", "upstream.test"),))].count == 3
+
+
+def test_stream_client_error_raises_and_frees_host_slot(monkeypatch):
+    async def scenario(http):
+        with pytest.raises(httpx.HTTPStatusError):
+            async for _ in http.stream_json_array(URL):
+                pass
+        return http._host_limit(URL)._value
+
+    free_slots = run_http(monkeypatch, lambda request: httpx.Response(404), scenario)
+    assert free_slots == phantom_bot.Config.HTTP_PER_HOST_LIMIT
+
+
+def test_scheduler_serves_interactive_before_background_in_arrival_order():
+    async def run():
+        scheduler = ProviderScheduler("test", rate=50, burst=1)
+        await scheduler.acquire()  # Vacía el bucket
+        granted = []
+
+        async def wait(name, priority):
+            await scheduler.acquire(priority)
+            granted.append(name)
+
+        waiters = [
+            asyncio.ensure_future(wait(name, priority))
+            for name, priority in [("bg1", PRIORITY_BACKGROUND), ("int1", PRIORITY_INTERACTIVE),
+                                   ("bg2", PRIORITY_BACKGROUND), ("int2", PRIORITY_INTERACTIVE)]
+        ]
+        await asyncio.gather(*waiters)
+        assert granted == ["int1", "int2", "bg1", "bg2"]
+        assert scheduler.stats()["queued"] == 4
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_does_not_take_a_token():
+    async def run():
+        scheduler = ProviderScheduler("test", rate=50, burst=1)
+        await scheduler.acquire()
+        cancelled = asyncio.ensure_future(scheduler.acquire())
+        kept = asyncio.ensure_future(scheduler.acquire())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+
+        await asyncio.wait_for(kept, 1)
+        assert cancelled.cancelled()
+        assert scheduler.requests == 2
+        assert scheduler.stats()["queue_depth"] == 0
+    asyncio.run(run())
+
+
+def test_429_penalizes_provider_for_retry_after(monkeypatch):
+    monkeypatch.setattr(phantom_bot.Config, "HTTP_BACKOFF", 0.001)
+    statuses = [429, 200]
+    sent_at = []
+
+    def handler(request):
+        sent_at.append(time.monotonic())
+        status = statuses.pop(0)
+        return httpx.Response(status, headers={"Retry-After": "1"} if status == 429 else {}, json={})
+
+    async def scenario(http):
+        response = await http.request("GET", f"{BASE}/price")
+        return response.status_code, http.scheduler(BASE).stats()
+
+    status, stats = run_http(monkeypatch, handler, scenario, rate_limit="1000/1000")
+
+    assert status == 200
+    assert stats["throttled"] == 1
+    assert sent_at[1] - sent_at[0] >= 1
+
+
+def test_server_errors_retry_with_backoff_without_penalizing(monkeypatch):
+    monkeypatch.setattr(phantom_bot.Config, "HTTP_BACKOFF", 0.001)
+    monkeypatch.setattr(phantom_bot.Config, "HTTP_RETRIES", 2)
+    statuses = [503, 502, 500]
+
+    def handler(request):
+        return httpx.Response(statuses.pop(0))
+
+    async def scenario(http):
+        with pytest.raises(httpx.HTTPStatusError):
+            await http.request("GET", f"{BASE}/price")
+        return http.scheduler(BASE).throttled
+
+    assert run_http(monkeypatch, handler, scenario) == 0
+    assert statuses == []
+
+
+def test_identical_gets_in_flight_are_deduplicated(monkeypatch):
+    sent = []
+
+    async def handler(request):
+        sent.append(str(request.url))
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"query": dict(request.url.params)})
+
+    async def scenario(http):
+        results = await asyncio.gather(
+            http.get_json(f"{BASE}/price", {"ids": "A", "vs": "USDC"}),
+            http.get_json(f"{BASE}/price", {"vs": "USDC", "ids": "A"}),
+            http.get_json(f"{BASE}/price", {"ids": "A", "vs": "USDC"}),
+            http.get_json(f"{BASE}/price", {"ids": "B", "vs": "USDC"})
+        )
+        return results, http.deduplicated
+
+    results, deduplicated = run_http(monkeypatch, handler, scenario, rate_limit="1000/1000")
+
+    assert results[:3] == [{"query": {"ids": "A", "vs": "USDC"}}] * 3
+    assert results[3] == {"query": {"ids": "B", "vs": "USDC"}}
+    assert deduplicated == 2
+    assert len(sent) == 2
@@ -0,0 +1,58 @@
+import pytest
+
+from phantom_bot import PortfolioValuation, TokenInfo
+
+A, B = "MintA" * 8, "MintB" * 8
+
+
+def valued_portfolio() -> PortfolioValuation:
+    valuation = PortfolioValuation()
+    valuation.apply_balances([{"mint": A, "amount": 2.0}, {"mint": B, "amount": 10.0}])
+    valuation.apply_prices({A: 1.5, B: 0.2})
+    valuation.apply_info(A, TokenInfo(A, symbol="AAA", price=1.5, price_change_24h=3.0))
+    valuation.apply_info(B, TokenInfo(B, symbol="BBB", price=0.2, price_change_24h=-1.0))
+    return valuation
+
+
+def test_unchanged_payload_changes_nothing_and_keeps_blocks():
+    valuation = valued_portfolio()
+    blocks = valuation.render_blocks()
+
+    assert valuation.apply_balances([{"mint": A, "amount": 2.0}, {"mint": B, "amount": 10.0}]) == []
+    assert valuation.apply_prices({A: 1.5, B: 0.2}) == []
+
+    again = valuation.render_blocks()
+    assert all(new is old for new, old in zip(again, blocks))
+    assert valuation.total_value == pytest.approx(5.0)
+
+
+def test_price_tick_rerenders_only_that_block():
+    valuation = valued_portfolio()
+    block_a, block_b = valuation.render_blocks()
+
+    assert valuation.apply_prices({A: 2.0, B: 0.2}) == [A]
+
+    new_a, new_b = valuation.render_blocks()
+    assert new_b is block_b
+    assert new_a != block_a and "$2.000000" in new_a
+    assert valuation.total_value == pytest.approx(6.0)
+
+
+def test_removed_position_is_subtracted_from_total():
+    valuation = valued_portfolio()
+
+    assert valuation.apply_balances([{"mint": B, "amount": 10.0}, {"mint": A, "amount": 0}]) == [A]
+
+    assert valuation.mints() == [B]
+    assert valuation.total_value == pytest.approx(2.0)
+    assert len(valuation.render_blocks()) == 1
+
+
+def test_missing_token_info_zeroes_the_position():
+    valuation = valued_portfolio()
+
+    valuation.apply_info(B, None)
+
+    assert valuation.positions[B].value == 0.0
+    assert valuation.total_value == pytest.approx(3.0)
+    assert "No se pudo obtener información" in valuation.render_blocks()[1]
@@ -0,0 +1,57 @@
+import multiprocessing
+
+import numpy as np
+
+from phantom_bot import PriceHistoryStore
+from stub_server import mint_for
+
+MINT = mint_for(7)
+
+
+def test_append_skips_points_already_stored(tmp_path):
+    store = PriceHistoryStore(str(tmp_path))
+
+    assert store.append(MINT, [10, 20, 30], [1.0, 2.0, 3.0], [0, 0, 0]) == 3
+    assert store.append(MINT, [20, 30, 40], [2.0, 3.0, 4.0], [0, 0, 0]) == 1
+
+    assert list(store.read(MINT)["time"]) == [10, 20, 30, 40]
+    assert list(store.read(MINT)["price"]) == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_torn_write_is_ignored_and_truncated(tmp_path):
+    store = PriceHistoryStore(str(tmp_path))
+    store.append(MINT, [10, 20], [1.0, 2.0], [0, 0])
+    with open(store._path(MINT), "ab") as f:
+        f.write(b"\x01" * 10)  # registro a medias de una escritura interrumpida
+
+    assert list(store.read(MINT)["time"]) == [10, 20]
+    assert store.append(MINT, [30], [3.0], [5.0]) == 1
+
+    records = store.read(MINT)
+    assert list(records["time"]) == [10, 20, 30]
+    assert records[-1]["price"] == 3.0 and records[-1]["volume"] == 5.0
+
+
+def append_range(directory, start):
+    store = PriceHistoryStore(directory)
+    for t in range(start, start + 200, 3):
+        store.append(MINT, [t, t + 1, t + 2], [float(t)] * 3, [0.0] * 3)
+
+
+def test_concurrent_appends_keep_times_unique_and_sorted(tmp_path):
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=append_range, args=(str(tmp_path), start)) for start in (0, 1, 2, 3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    times = PriceHistoryStore(str(tmp_path)).read(MINT)["time"]
+    assert (np.diff(times) > 0).all()
+
+
+def test_empty_append_creates_no_file(tmp_path):
+    store = PriceHistoryStore(str(tmp_path))
+
+    assert store.append(MINT, [], [], []) == 0
+    assert list(tmp_path.iterdir()) == []
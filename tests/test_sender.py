@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+from telegram.error import RetryAfter
+
+import phantom_bot
+from phantom_bot import MessageSender
+
+PAUSE = 0.3
+
+
+class FloodedChat:
+    """reply() que responde RetryAfter las primeras `floods` veces"""
+
+    def __init__(self, floods: int = 0):
+        self.floods = floods
+        self.sent = []
+
+    async def reply(self, text, **kwargs):
+        if self.floods:
+            self.floods -= 1
+            raise RetryAfter(PAUSE)
+        self.sent.append((text, time.monotonic()))
+
+
+def sender(monkeypatch) -> MessageSender:
+    monkeypatch.setattr(phantom_bot.Config, "SEND_RATE_LIMIT", "1000/1000")
+    monkeypatch.setattr(phantom_bot.Config, "SEND_RETRIES", 2)
+    return MessageSender()
+
+
+def test_retry_after_pauses_only_that_chat(monkeypatch):
+    async def run():
+        messages = sender(monkeypatch)
+        flooded, other = FloodedChat(floods=1), FloodedChat()
+        started = time.monotonic()
+
+        async def send_other():
+            await asyncio.sleep(0.05)  # cuando el primer chat ya está pausado
+            await messages.send(other.reply, 2, ["b1", "b2"])
+
+        await asyncio.gather(messages.send(flooded.reply, 1, ["a1", "a2"]), send_other())
+
+        assert [text for text, _ in flooded.sent] == ["a1", "a2"]
+        assert flooded.sent[0][1] - started >= PAUSE
+        assert all(sent_at - started < PAUSE for _, sent_at in other.sent)
+        assert messages.scheduler.throttled == 0
+        assert messages.retries == 1
+    asyncio.run(run())
+
+
+def test_retry_after_in_several_chats_pauses_the_bucket(monkeypatch):
+    async def run():
+        messages = sender(monkeypatch)
+        chats = [FloodedChat(floods=1), FloodedChat(floods=1)]
+
+        await asyncio.gather(*(messages.send(chat.reply, i, ["x"]) for i, chat in enumerate(chats)))
+
+        assert all(chat.sent for chat in chats)
+        assert messages.scheduler.throttled == 1
+    asyncio.run(run())
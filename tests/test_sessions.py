@@ -0,0 +1,91 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from phantom_bot import ManagedExecutor, MemorySessionStore, SQLiteSessionStore
+
+
+@pytest.fixture
+def executor():
+    executor = ManagedExecutor("io", workers=2, queue_size=8)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path, executor):
+    stores = []
+
+    def make(ttl: float = 60):
+        if request.param == "memory":
+            store = MemorySessionStore(ttl)
+        else:
+            store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl, executor)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        if isinstance(store, SQLiteSessionStore):
+            store.close()
+
+
+def test_sessions_expire_after_ttl(make_store):
+    store = make_store(ttl=0.05)
+
+    async def run():
+        await store.set(1, "wallet-1")
+        assert await store.get(1) == "wallet-1"
+        await asyncio.sleep(0.08)
+        assert await store.get(1) is None
+    asyncio.run(run())
+
+
+def test_set_renews_and_delete_reports_existing(make_store):
+    store = make_store()
+
+    async def run():
+        await store.set(1, "old")
+        await store.set(1, "new")
+        assert await store.get(1) == "new"
+        assert await store.delete(1) is True
+        assert await store.delete(1) is False
+        assert await store.get(1) is None
+    asyncio.run(run())
+
+
+def test_sqlite_sessions_persist_across_instances(tmp_path, executor):
+    path = str(tmp_path / "sessions.db")
+
+    async def run():
+        first = SQLiteSessionStore(path, 60, executor)
+        await first.set(7, "wallet-7")
+        first.close()
+
+        second = SQLiteSessionStore(path, 60, executor)
+        try:
+            assert await second.get(7) == "wallet-7"
+        finally:
+            second.close()
+    asyncio.run(run())
+
+
+def test_sqlite_purge_removes_only_expired_rows(tmp_path, executor):
+    path = str(tmp_path / "sessions.db")
+
+    async def run():
+        store = SQLiteSessionStore(path, 60, executor)
+        try:
+            await store.set(1, "active")
+            store._execute(
+                "INSERT INTO sessions (user_id, wallet, expires_at) VALUES (?, ?, ?)", (2, "expired", time.time() - 1)
+            )
+            await store.purge_expired()
+        finally:
+            store.close()
+
+        with sqlite3.connect(path) as conn:
+            assert conn.execute("SELECT user_id FROM sessions").fetchall() == [(1,)]
+    asyncio.run(run())
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+from phantom_bot import TA_PARAMS, TechnicalAnalyzer
+
+
+def reference_indicators(prices, volumes) -> dict:
+    """Indicadores de una sola serie con la API de pandas (implementación de referencia)"""
+    prices = pd.Series(prices, dtype=float)
+    delta = prices.diff()
+    period = TA_PARAMS['RSI_PERIOD']
+    avg_gain = delta.clip(lower=0).ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+    avg_loss = (-delta).clip(lower=0).ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + avg_gain.iloc[-1] / avg_loss.iloc[-1])
+    if avg_loss.iloc[-1] == 0 and avg_gain.iloc[-1] > 0:
+        rsi = 100.0
+
+    fast = prices.ewm(span=TA_PARAMS['MACD_FAST'], adjust=False).mean()
+    slow = prices.ewm(span=TA_PARAMS['MACD_SLOW'], adjust=False, min_periods=TA_PARAMS['MACD_SLOW']).mean()
+    macd = fast - slow
+    signal = macd.ewm(span=TA_PARAMS['MACD_SIGNAL'], adjust=False, min_periods=TA_PARAMS['MACD_SIGNAL']).mean()
+    hist = macd - signal
+    cross = 0
+    if hist.iloc[-2] <= 0 < hist.iloc[-1]:
+        cross = 1
+    elif hist.iloc[-2] >= 0 > hist.iloc[-1]:
+        cross = -1
+
+    baseline = np.mean(volumes[:-1])
+    volume_change = (volumes[-1] - baseline) / baseline * 100
+    return {
+        "rsi": rsi,
+        "macd": macd.iloc[-1],
+        "macd_signal": signal.iloc[-1],
+        "macd_hist": hist.iloc[-1],
+        "macd_cross": cross,
+        "volume_change": volume_change,
+        "volume_spike": volume_change > TA_PARAMS['VOLUME_CHANGE_THRESHOLD']
+    }
+
+
+def random_series(count: int, seed: int = 8):
+    rng = np.random.default_rng(seed)
+    prices, volumes = [], []
+    for _ in range(count):
+        length = int(rng.integers(40, 120))
+        prices.append(list(100 * np.exp(np.cumsum(rng.normal(0, 0.03, length)))))
+        volumes.append(list(rng.lognormal(10, 0.6, length)))
+    return prices, volumes
+
+
+def test_batch_matches_pandas_reference_per_series():
+    prices, volumes = random_series(400)
+
+    batch = TechnicalAnalyzer().compute(prices, volumes)
+
+    for row, (price, volume) in enumerate(zip(prices, volumes)):
+        expected = reference_indicators(price, volume)
+        for name, value in expected.items():
+            assert np.isclose(batch[name][row], value, rtol=1e-9, equal_nan=True), (row, name)
+    # Con 400 series aleatorias aparecen cruces en ambos sentidos y picos de volumen
+    assert {1, -1} <= set(batch["macd_cross"])
+    assert batch["volume_spike"].any()
+
+
+def test_rows_of_different_lengths_match_computing_each_alone():
+    prices, volumes = random_series(30, seed=3)
+    analyzer = TechnicalAnalyzer()
+
+    batch = analyzer.compute(prices, volumes)
+
+    for row, (price, volume) in enumerate(zip(prices, volumes)):
+        alone = analyzer.compute([price], [volume])
+        for name in batch:
+            assert np.isclose(batch[name][row], alone[name][0], rtol=1e-12, equal_nan=True), (row, name)
+
+
+def test_edge_cases():
+    analyzer = TechnicalAnalyzer()
+    rising = list(np.linspace(1, 2, 40))
+    flat_volume = [1000.0] * 39
+
+    result = analyzer.compute([rising, rising[:10]], [flat_volume + [10000.0], flat_volume[:10]])
+
+    assert result["rsi"][0] == 100.0  # Solo subidas
+    assert np.isnan(result["rsi"][1])  # Menos puntos que el periodo del RSI
+    assert np.isnan(result["macd"][1])  # Menos puntos que la EMA lenta
+    assert np.isclose(result["volume_change"][0], 900.0) and result["volume_spike"][0]
+    assert result["volume_change"][1] == 0.0 and not result["volume_spike"][1]
+    assert list(result["macd_cross"]) == [0, 0]
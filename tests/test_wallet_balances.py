@@ -0,0 +1,55 @@
+import asyncio
+
+from aiohttp.test_utils import TestServer
+
+import phantom_bot
+from phantom_bot import WRAPPED_SOL_MINT, PortfolioValuation, TokenAnalyzer
+from stub_server import StubUpstream, mint_for
+
+OWNER = mint_for(-42)
+
+
+def fetch_balances(stub: StubUpstream, monkeypatch):
+    """Ejecutar get_wallet_balances contra el servidor RPC simulado"""
+    async def run():
+        async with TestServer(stub.app()) as server:
+            monkeypatch.setattr(phantom_bot.Config, "SOLANA_RPC_URL", str(server.make_url("/rpc")))
+            analyzer = TokenAnalyzer()
+            try:
+                return await analyzer.get_wallet_balances(OWNER)
+            finally:
+                await analyzer.http.close()
+    return asyncio.run(run())
+
+
+def stub(**kwargs) -> StubUpstream:
+    return StubUpstream(latency_ms=0, pairs=1, **kwargs)
+
+
+def test_token_and_token2022_accounts(monkeypatch):
+    balances = fetch_balances(stub(wallet_tokens=2, token2022_tokens=1, lamports=0), monkeypatch)
+
+    assert balances == [
+        {"mint": mint_for(0), "amount": 1.0},
+        {"mint": mint_for(1), "amount": 2.0},
+        {"mint": mint_for(2), "amount": 3.0},
+    ]
+
+
+def test_native_sol_and_wrapped_sol_are_one_position(monkeypatch):
+    balances = fetch_balances(
+        stub(wallet_tokens=0, lamports=5 * 10 ** 9, wsol_lamports=2 * 10 ** 9), monkeypatch
+    )
+
+    assert balances == [{"mint": WRAPPED_SOL_MINT, "amount": 7.0}]
+    valuation = PortfolioValuation()
+    valuation.apply_balances(balances)
+    valuation.apply_prices({WRAPPED_SOL_MINT: 100.0})
+    assert valuation.total_value == 700.0
+
+
+def test_rpc_error_returns_none_for_webapp_fallback(monkeypatch):
+    upstream = stub(wallet_tokens=1)
+    upstream.rpc_error = "Node is behind"
+
+    assert fetch_balances(upstream, monkeypatch) is None
@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import urlencode
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+import phantom_bot
+from phantom_bot import Config, PhantomBot, build_web_app
+from stub_server import mint_for
+
+SECRET = "s3cr3t"
+
+
+class FakeTelegramBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+class FakeApplication:
+    def __init__(self):
+        self.bot = FakeTelegramBot()
+        self.update_queue = asyncio.Queue()
+
+
+def signed_init_data(user: dict) -> str:
+    """initData firmado como lo haría Telegram con el token del bot"""
+    params = {"auth_date": str(int(time.time())), "user": json.dumps(user)}
+    data_check_string = "\n".join(f"{key}={value}" for key, value in sorted(params.items()))
+    secret_key = hmac.new(b"WebAppData", Config.TELEGRAM_TOKEN.encode(), hashlib.sha256).digest()
+    params["hash"] = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    return urlencode(params)
+
+
+def run_client(monkeypatch, scenario):
+    """Ejecutar `scenario(client, bot, application)` contra build_web_app sin abrir puertos"""
+    monkeypatch.setattr(phantom_bot.Config, "SESSION_BACKEND", "memory")
+    monkeypatch.setattr(phantom_bot.Config, "WEBHOOK_SECRET", SECRET)
+
+    async def run():
+        bot, application = PhantomBot(), FakeApplication()
+        try:
+            async with TestClient(TestServer(build_web_app(bot, application, webhook=True))) as client:
+                await scenario(client, bot, application)
+        finally:
+            await bot.token_analyzer.close()
+    asyncio.run(run())
+
+
+def test_webhook_rejects_wrong_secret_token(monkeypatch):
+    async def scenario(client, bot, application):
+        response = await client.post(Config.WEBHOOK_PATH, json={"update_id": 1},
+                                     headers={"X-Telegram-Bot-Api-Secret-Token": "otro"})
+        assert response.status == 403
+        assert application.update_queue.empty()
+    run_client(monkeypatch, scenario)
+
+
+def test_webhook_queues_update(monkeypatch):
+    async def scenario(client, bot, application):
+        response = await client.post(Config.WEBHOOK_PATH, json={"update_id": 42},
+                                     headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})
+        assert response.status == 200
+        assert application.update_queue.get_nowait().update_id == 42
+    run_client(monkeypatch, scenario)
+
+
+def test_non_object_json_is_bad_request(monkeypatch):
+    async def scenario(client, bot, application):
+        headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+        for body in ([1, 2], 3, "update", {"foo": 1}):
+            response = await client.post(Config.WEBHOOK_PATH, json=body, headers=headers)
+            assert response.status == 400
+        for body in ([1, 2], 3, {"initData": "", "data": [1]}):
+            response = await client.post("/api/webapp-data", json=body)
+            assert response.status == 400
+        assert application.update_queue.empty()
+    run_client(monkeypatch, scenario)
+
+
+def test_webapp_data_with_signed_init_data(monkeypatch):
+    wallet = mint_for(3)
+
+    async def scenario(client, bot, application):
+        data = {"action": "wallet_connected", "publicKey": wallet}
+        response = await client.post("/api/webapp-data", json={"initData": "hash=00", "data": data})
+        assert response.status == 401
+
+        response = await client.post("/api/webapp-data",
+                                     json={"initData": signed_init_data({"id": 77}), "data": data})
+        assert response.status == 200
+        assert await bot.sessions.get(77) == wallet
+        assert [chat_id for chat_id, _ in application.bot.sent] == [77]
+    run_client(monkeypatch, scenario)
+
+
+def test_webhook_rejects_everything_without_configured_secret(monkeypatch):
+    async def scenario(client, bot, application):
+        monkeypatch.setattr(phantom_bot.Config, "WEBHOOK_SECRET", None)
+        for headers in ({}, {"X-Telegram-Bot-Api-Secret-Token": ""}):
+            response = await client.post(Config.WEBHOOK_PATH, json={"update_id": 1}, headers=headers)
+            assert response.status == 403
+        assert application.update_queue.empty()
+    run_client(monkeypatch, scenario)
+
+
+def test_run_webhook_requires_secret(monkeypatch):
+    monkeypatch.setattr(phantom_bot.Config, "WEBHOOK_URL", "https://bot.example")
+    monkeypatch.setattr(phantom_bot.Config, "WEBHOOK_SECRET", "")
+
+    with pytest.raises(ValueError, match="WEBHOOK_SECRET"):
+        asyncio.run(phantom_bot.run_webhook(None, None))
+
+
+def test_api_token_rejects_invalid_mint_before_fetching(monkeypatch):
+    async def scenario(client, bot, application):
+        async def unexpected_fetch(mint):
+            raise AssertionError("no debería consultar upstream")
+        monkeypatch.setattr(bot.token_analyzer, "get_token_info", unexpected_fetch)
+
+        for mint in ("..%2F..%2Fetc", "0OIl" * 10, "short"):
+            response = await client.get(f"/api/token/{mint}")
+            assert response.status == 400
+    run_client(monkeypatch, scenario)
+
+
+def test_metrics_require_bearer_token(monkeypatch):
+    async def scenario(client, bot, application):
+        monkeypatch.setattr(phantom_bot.Config, "METRICS_TOKEN", None)
+        assert (await client.get("/metrics", headers={"Authorization": "Bearer "})).status == 403
+
+        monkeypatch.setattr(phantom_bot.Config, "METRICS_TOKEN", "scrape")
+        assert (await client.get("/metrics")).status == 403
+        assert (await client.get("/metrics", headers={"Authorization": "Bearer otro"})).status == 403
+        response = await client.get("/metrics", headers={"Authorization": "Bearer scrape"})
+        assert response.status == 200
+        assert (await client.get("/healthz")).status == 200
+    run_client(monkeypatch, scenario)